@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import io
+import os
+import threading
+from lazyimport import lazy_import
+
+import figure
+
+# heavy modules are imported on first use (see lazyimport.py)
+futures = lazy_import("concurrent.futures")
+multiprocessing = lazy_import("multiprocessing")
+tempfile = lazy_import("tempfile")
+outputcache = lazy_import("outputcache")
+
+ASYNC_WORKERS = min(4, os.cpu_count() or 1)  # worker processes of make_figure_async
+
+# worker processes of make_figure_async, one pool per debug mode
+_process_pools = {}
+# thread of save_async, figures of the calling process are saved one after another
+_save_thread = None
+_pool_lock = threading.Lock()
+
+
+def _process_pool(debug):
+    """
+    returns the worker processes of make_figure_async (started on first use)
+    """
+    with _pool_lock:
+        if debug not in _process_pools:
+            context = multiprocessing.get_context("spawn")
+            _process_pools[debug] = futures.ProcessPoolExecutor(
+                max_workers=ASYNC_WORKERS, mp_context=context,
+                initializer=figure._init_worker, initargs=(debug,))
+        return _process_pools[debug]
+
+
+def _save_executor():
+    """
+    returns the thread of save_async (started on first use)
+    """
+    global _save_thread
+    with _pool_lock:
+        if _save_thread is None:
+            _save_thread = futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="save_async")
+        return _save_thread
+
+
+def figure_bytes(fig, formats, dpi=None):
+    """
+    Saves a figure in memory and returns a dict {format: bytes}
+
+    - formats: format or list of formats, e.g. ["pdf", "png"]
+    - dpi: resolution (default savefig.dpi)
+
+    A single format is saved into a buffer, several formats are saved with one
+    draw pass (see figure.save_figure) into a temporary directory and read back.
+    """
+    formats = [formats] if isinstance(formats, str) else list(formats)
+    if len(formats) == 1:
+        buffer = io.BytesIO()
+        with figure._figure_style(fig):
+            figure.prefetch_text_metrics(fig)
+            fig.savefig(buffer, format=formats[0], dpi=dpi)
+        return {formats[0]: buffer.getvalue()}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = figure.save_figure(fig, [os.path.join(tmpdir, "figure." + formats[0])] + formats[1:], dpi)
+        result = {}
+        for f, path in zip(formats, paths):
+            with open(path, "rb") as file:
+                result[f] = file.read()
+        return result
+
+
+def _render_bytes(spec, formats, dpi):
+    """
+    renders a figure spec inside a worker process of make_figure_async
+    """
+    fig, ax = figure.make_figure(**dict({"pyplot": False, "reuse": True}, **figure._resolve_arrays(spec)))
+    try:
+        return figure_bytes(fig, formats, dpi)
+    finally:
+        figure.release_figure(fig, reuse=True)
+        figure._detach_arrays()
+
+
+async def make_figure_async(formats="pdf", dpi=None, timeout=None, **kwargs):
+    """
+    Creates, plots and saves a figure in a worker process without blocking the event loop
+    and returns the saved figure in memory as dict {format: bytes}, e.g.
+
+        files = await make_figure_async(["pdf", "png"], width=8, unit="cm", plots=plots)
+
+    - formats: format or list of formats
+    - dpi: resolution (default savefig.dpi)
+    - timeout: seconds until asyncio.TimeoutError is raised (default None: no limit)
+    - cache: outputcache.OutputCache; the files of a figure with the same arguments, plots code
+      and data are returned from the cache without rendering (looked up and stored in this process)
+    - all other keyword arguments are passed to make_figure (except output_file)
+
+    At most ASYNC_WORKERS figures are rendered at once, further calls wait for a free worker.
+    Every worker is a separate process, so setup, rcParams and pyplot of concurrent
+    requests do not affect each other (and the plots function must be defined
+    at module level, see figure.make_figures).
+    Large arrays in the arguments are passed in shared memory (see figure.share_array).
+    Cancelling the call (or the timeout) removes a waiting figure from the queue,
+    a figure which is already rendered is finished by its worker, but not returned.
+    """
+    if kwargs.get("output_file"):
+        raise ValueError("ERROR: make_figure_async returns the files in memory, output_file is not supported")
+    cache = kwargs.pop("cache", None)
+    key = None
+    if cache is not None and kwargs.get("plots"):
+        key = outputcache.figure_key(formats=formats, dpi=dpi, **kwargs)
+        if key is None:
+            # arguments which can not be hashed by content: the figure is always rendered
+            cache.misses += 1
+        else:
+            files = cache.fetch_bytes(key, formats)
+            if files is not None:
+                return files
+    pool = _process_pool(kwargs.get("debug", False))
+    handles = []
+    spec = figure._share_arrays(kwargs, {}, handles)
+    try:
+        job = asyncio.wrap_future(pool.submit(_render_bytes, spec, formats, dpi))
+        files = await asyncio.wait_for(job, timeout)
+    finally:
+        for handle in handles:
+            handle.release()
+    if key is not None:
+        cache.store_bytes(key, files)
+    return files
+
+
+async def save_async(fig, formats="pdf", dpi=None, timeout=None):
+    """
+    Saves a figure of this process in memory without blocking the event loop
+    and returns a dict {format: bytes} (see figure_bytes)
+
+    - formats: format or list of formats
+    - dpi: resolution (default savefig.dpi)
+    - timeout: seconds until asyncio.TimeoutError is raised (default None: no limit)
+
+    The figures are saved one after another by a single background thread,
+    because matplotlib can not draw in several threads at once.
+    The figure must not be changed until the call returns.
+    """
+    job = asyncio.wrap_future(_save_executor().submit(figure_bytes, fig, formats, dpi))
+    return await asyncio.wait_for(job, timeout)
+
+
+def shutdown_async(wait=True):
+    """
+    stops the worker processes and the thread of make_figure_async and save_async
+    """
+    global _save_thread
+    with _pool_lock:
+        for pool in _process_pools.values():
+            pool.shutdown(wait=wait, cancel_futures=True)
+        _process_pools.clear()
+        if _save_thread is not None:
+            _save_thread.shutdown(wait=wait, cancel_futures=True)
+            _save_thread = None
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+"""
+Measures the startup time of figure.py and contourplots.py in fresh interpreters
+usage: python bench_import.py [number of runs]
+
+"eager imports" are the modules which figure.py imported at the top before
+the heavy modules were loaded lazily, i.e. the time "import figure" took before.
+"""
+
+runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+cases = [
+    ("python only", "pass"),
+    ("eager imports (before)", "import matplotlib.pyplot, matplotlib.backends.backend_pgf, numpy, cycler, locale, datetime"),
+    ("import figure", "import figure"),
+    ("calculate_figure_size", "import figure; figure.calculate_figure_size(8, None, 'cm')"),
+    ("setup()", "import figure; figure.setup()"),
+    ("import contourplots", "import contourplots"),
+]
+
+for name, statement in cases:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=folder, check=True)
+        times.append(time.perf_counter() - start)
+    print("%-25s %7.1f ms" % (name, 1000 * statistics.median(times)))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent import futures
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))      # add path to figure.py
+from figure import share_array, _detach_arrays
+
+"""
+Compares the ways to pass a large array to a worker process (like make_figures does):
+pickling it, copying it once into shared memory (share_array) and reusing a shared
+array for a second figure, and a memory mapped .npy file (np.load(..., mmap_mode="r")).
+The worker reads the whole array (sum), the time includes sharing, sending and reading.
+usage: python bench_shared_memory.py [size in MB] [runs]
+(the best time of runs is shown)
+"""
+
+size = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+
+def checksum(array):
+    return float(np.sum(array))
+
+
+def checksum_shared(handle):
+    result = float(np.sum(handle.array()))
+    _detach_arrays()
+    return result
+
+
+def best(function):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def shared_once(executor, array):
+    with share_array(array) as handle:
+        executor.submit(checksum_shared, handle).result()
+
+
+if __name__ == "__main__":
+    z = np.random.default_rng(0).random(size * 2**20 // 8)
+    context = multiprocessing.get_context("spawn")
+    with futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor, \
+            tempfile.TemporaryDirectory() as folder:
+        executor.submit(checksum, z[:10]).result()  # starts the worker
+        np.save(os.path.join(folder, "z.npy"), z)
+        z_file = np.load(os.path.join(folder, "z.npy"), mmap_mode="r")
+        reused = share_array(z)
+        cases = [("pickle", lambda: executor.submit(checksum, z).result()),
+                 ("shared memory", lambda: shared_once(executor, z)),
+                 ("shared memory (reused)", lambda: executor.submit(checksum_shared, reused).result()),
+                 ("memory mapped file", lambda: executor.submit(checksum_shared, share_array(z_file)).result())]
+        print("array of %d MB, best of %d runs" % (size, runs))
+        for name, function in cases:
+            print("%-24s %8.3f s" % (name, best(function)))
+        reused.release()
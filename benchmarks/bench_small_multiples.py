@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))      # add path to figure.py
+from figure import make_figure, plot_series, release_figure
+
+"""
+Compares a grid of subplots of make_figure (adjust_axes for every axes,
+one plot call per line) with make_figure(small_multiples=True) and plot_series
+(shared ticks and limits, ticks from rcParams, one LineCollection per axes) in debug mode (Agg)
+usage: python bench_small_multiples.py [lines per axes] [largest grid size] [runs]
+(the best time of runs is shown)
+"""
+
+lines = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+largest = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+runs = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+x = np.linspace(0, 1, 200)
+ys = np.random.default_rng(0).random((lines, x.size))
+
+
+def plot_lines(fig, ax):
+    for a in ax.flat:
+        for y in ys:
+            a.plot(x, y)
+
+
+def plot_collections(fig, ax):
+    for a in ax.flat:
+        plot_series(a, x, ys)
+
+
+print("%-8s %-16s %10s %10s" % ("panels", "mode", "create [s]", "save [s]"))
+for n in [2, 5, 10, 20]:
+    if n > largest:
+        break
+    for name, kwargs in [("subplots", dict(plots=plot_lines)),
+                         ("small_multiples", dict(plots=plot_collections, small_multiples=True))]:
+        create, save = [], []
+        for _ in range(runs):
+            start = time.perf_counter()
+            fig, ax = make_figure(width=2 * n, height=2 * n, unit="cm", num_subplots_x=n, num_subplots_y=n,
+                                  debug=True, pyplot=False, **kwargs)
+            created = time.perf_counter()
+            fig.savefig(io.BytesIO(), format="png", dpi=100)
+            create.append(created - start)
+            save.append(time.perf_counter() - created)
+            release_figure(fig)
+        print("%-8d %-16s %10.2f %10.2f" % (n * n, name, min(create), min(save)))
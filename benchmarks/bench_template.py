@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import sys
+import os
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))      # add path to figure.py
+
+from figure import make_figure, release_figure
+from figuretemplate import FigureTemplate
+from contourplots import contourplot
+
+"""
+Compares the throughput of make_figure for every dataset with FigureTemplate.render
+usage: python bench_template.py [number of datasets] [output format] [--latex]
+without --latex the figures are rendered in debug mode (no LaTeX needed)
+"""
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+file_format = sys.argv[2] if len(sys.argv) > 2 else "png"
+debug = "--latex" not in sys.argv
+
+x = np.linspace(0, 20, 500)
+grid = np.linspace(0, 1, 200)
+datasets = [(np.sin(x + i), np.cos(x + i), np.outer(np.sin(grid + i), np.cos(grid))) for i in range(n)]
+
+
+def plots(fig, ax, data):
+    y1, y2, z = data
+    ax[0].plot(x, y1, label="sin")
+    ax[0].plot(x, y2, label="cos")
+    ax[0].legend()
+    ax[0].set_xlabel("x values")
+    ax[0].set_ylabel("y values")
+    contourplot(fig, ax[1], grid, grid, z, x_label="x", y_label="y", z_label="z")
+
+
+with tempfile.TemporaryDirectory() as folder:
+    output_file = os.path.join(folder, "figure." + file_format)
+    kwargs = dict(width=16, height=6, unit="cm", num_subplots_x=2, debug=debug)
+
+    start = time.perf_counter()
+    for data in datasets:
+        fig, ax = make_figure(pyplot=False, plots=lambda fig, ax: plots(fig, ax, data), output_file=output_file, **kwargs)
+        release_figure(fig)
+    make_figure_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    template = FigureTemplate(plots, datasets[0], **kwargs)
+    for y1, y2, z in datasets:
+        template.render([(x, y1), (x, y2), z], output_file)
+    template.close()
+    template_time = time.perf_counter() - start
+
+print("make_figure:    %6.1f figures/s" % (n / make_figure_time))
+print("FigureTemplate: %6.1f figures/s" % (n / template_time))
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))      # add path to figure.py
+
+"""
+Benchmark suite of the hot paths of figure.py and contourplots.py, runs offline.
+Every case runs in a fresh python process (repeated runs times), which reports
+the wall time of the case, the peak memory (RSS) of the process and the size
+of the saved file. Cases marked as cold are timed on their first call in the process
+(e.g. setup and the start of LaTeX), all other cases after one untimed warm-up call.
+The cases which need LaTeX are skipped if pdflatex is not installed (or with --no-latex).
+
+usage:
+    python run.py                              runs all cases
+    python run.py -k contourplot               runs the cases whose name contains contourplot
+    python run.py --save baseline.json         saves the results as baseline
+    python run.py --compare baseline.json      compares with a baseline, exit code 1 if a case
+                                               got slower, needs more memory or writes a larger file
+                                               by more than --threshold (default 0.2: 20 %)
+"""
+
+CASES = {}  # name -> (function, needs LaTeX, cold)
+
+
+def case(name, latex=False, cold=False):
+    """
+    registers a benchmark case: the function prepares the case (not timed)
+    and returns a function which runs it and returns the path of the saved file (or None)
+    """
+    def register(function):
+        CASES[name] = (function, latex, cold)
+        return function
+    return register
+
+
+def _lines(n=10000, count=3):
+    import numpy as np
+    x = np.linspace(0, 10, n)
+    return x, [np.sin(x + i) for i in range(count)]
+
+
+def _plot_lines(fig, ax):
+    x, ys = _lines()
+    for i, y in enumerate(ys):
+        ax.plot(x, y, label="line %d" % i)
+    ax.set_xlabel("time in s")
+    ax.set_ylabel("amplitude")
+    ax.legend()
+
+
+def _setup_case(name, debug, **kwargs):
+    @case(name, latex=not debug, cold=True)
+    def prepare(folder):
+        import figure
+
+        def run():
+            figure.setup(debug=debug, **kwargs)
+            if not debug:
+                # starts LaTeX with the preamble and measures a text
+                figure.latex_manager(check=True)
+        return run
+
+
+_setup_case("setup/serif", True)
+_setup_case("setup/sans-serif", True, serif=False)
+_setup_case("setup/latex-serif", False)
+_setup_case("setup/latex-sans-serif", False, serif=False)
+# the format file is stored in figure.FORMAT_CACHE_DIR, so only the first run compiles it
+_setup_case("setup/latex-format-cache", False, format_cache=True)
+
+
+def _make_figure_case(name, **kwargs):
+    @case(name)
+    def prepare(folder):
+        import figure
+
+        def run():
+            fig, ax = figure.make_figure(width=8, unit="cm", debug=True, pyplot=False, **kwargs)
+            figure.release_figure(fig)
+        return run
+
+
+_make_figure_case("make_figure/single-axes", plots=_plot_lines)
+_make_figure_case("make_figure/grid-3x3", num_subplots_x=3, num_subplots_y=3)
+_make_figure_case("make_figure/grid-10x10", num_subplots_x=10, num_subplots_y=10)
+_make_figure_case("make_figure/small-multiples-10x10", num_subplots_x=10, num_subplots_y=10,
+                  small_multiples=True)
+
+
+@case("adjust_axes/100-axes")
+def adjust_axes_case(folder):
+    import figure
+    figure.setup(debug=True)
+    fig = figure.mfigure.Figure()
+    axes = fig.subplots(10, 10).ravel()
+
+    def run():
+        for a in axes:
+            figure.adjust_axes(a)
+    return run
+
+
+def _contourplot_case(n):
+    @case("contourplot/%dx%d" % (n, n))
+    def prepare(folder):
+        import numpy as np
+        import figure
+        import contourplots
+        x, y = np.linspace(0, 1, n), np.linspace(0, 2, n)
+        z = np.sin(10 * x)[:, None] * np.cos(5 * y)[None, :]
+        path = os.path.join(folder, "contourplot.png")
+
+        def plots(fig, ax):
+            contourplots.contourplot(fig, ax, x, y, z, "x", "y", "z")
+
+        def run():
+            fig, ax = figure.make_figure(width=8, unit="cm", plots=plots, output_file=path,
+                                         debug=True, pyplot=False)
+            figure.release_figure(fig)
+            return path
+        return run
+
+
+for n in [100, 500, 2000]:
+    _contourplot_case(n)
+
+
+@case("generate_formatter/10000-ticks")
+def generate_formatter_case(folder):
+    import numpy as np
+    import contourplots
+    formatter = contourplots.generate_formatter(np.linspace(-2e4, 2e4, 10000))
+
+    def run():
+        for i in range(10000):
+            formatter(i)
+    return run
+
+
+@case("IndexFormatter/10000-ticks")
+def index_formatter_case(folder):
+    import numpy as np
+    import formatters
+    formatter = formatters.IndexFormatter(np.linspace(-2e4, 2e4, 10000))
+
+    def run():
+        formatter.format_ticks(np.arange(10000))
+    return run
+
+
+def _legend_case(name, debug):
+    @case(name, latex=not debug, cold=True)
+    def prepare(folder):
+        import figure
+        fig, ax = figure.make_figure(width=8, unit="cm", plots=_plot_lines, debug=debug, pyplot=False)
+        legend = ax.get_legend()
+
+        def run():
+            # the texts are measured on the first call (LaTeX with the pgf backend)
+            figure.align_legend_right(fig, legend)
+        return run
+
+
+_legend_case("align_legend_right/agg", True)
+_legend_case("align_legend_right/latex", False)
+
+
+def _savefig_case(file_format, debug):
+    name = "savefig/%s-%s" % ("debug" if debug else "latex", file_format)
+
+    @case(name, latex=not debug)
+    def prepare(folder):
+        import figure
+        fig, ax = figure.make_figure(width=8, unit="cm", plots=_plot_lines, debug=debug, pyplot=False)
+        path = os.path.join(folder, "figure." + file_format)
+
+        def run():
+            figure.save_figure(fig, path)
+            return path
+        return run
+
+
+for f in ["pdf", "svg", "png"]:
+    _savefig_case(f, True)
+for f in ["pgf", "pdf", "png"]:
+    _savefig_case(f, False)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # not available on windows
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def run_case(name):
+    """
+    runs one case in this process and returns its result
+    (wall time in s, peak RSS in MB, size of the saved file in bytes)
+    """
+    function, latex, cold = CASES[name]
+    with tempfile.TemporaryDirectory() as folder:
+        run = function(folder)
+        if not cold:
+            run()
+        start = time.perf_counter()
+        path = run()
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(path) if path else None
+    return {"time": elapsed, "rss_mb": _peak_rss_mb(), "size": size}
+
+
+def measure(name, runs, timeout=600):
+    """
+    runs a case in runs fresh processes and returns the best time, the largest RSS and the file size
+    """
+    results = []
+    for _ in range(runs):
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name],
+                                 capture_output=True, text=True, timeout=timeout)
+        if process.returncode != 0:
+            raise RuntimeError("ERROR: case %s failed\n%s" % (name, process.stderr))
+        results.append(json.loads(process.stdout.strip().splitlines()[-1]))
+    rss = [r["rss_mb"] for r in results if r["rss_mb"] is not None]
+    return {"time": min(r["time"] for r in results), "rss_mb": max(rss) if rss else None,
+            "size": results[-1]["size"]}
+
+
+def _environment():
+    import matplotlib
+    import numpy
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit, "python": platform.python_version(), "numpy": numpy.__version__,
+            "matplotlib": matplotlib.__version__, "platform": platform.platform()}
+
+
+def compare(results, baseline, threshold):
+    """
+    prints the ratio of every value to the baseline and returns the regressions
+    (values which are larger than the baseline by more than threshold)
+    """
+    regressions = []
+    print("\ncompared with %s (threshold %.0f %%)" % (baseline.get("environment", {}).get("commit") or "baseline",
+                                                      100 * threshold))
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print("%-40s new case" % name)
+            continue
+        ratios = []
+        for key in ["time", "rss_mb", "size"]:
+            if result[key] is None or not old.get(key):
+                ratios.append("")
+                continue
+            ratio = result[key] / old[key]
+            ratios.append("%s %.2fx" % (key, ratio))
+            if ratio > 1 + threshold:
+                regressions.append("%s: %s %.4g -> %.4g" % (name, key, old[key], result[key]))
+        print("%-40s %-14s %-16s %s" % tuple([name] + ratios))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmarks of figure.py and contourplots.py")
+    parser.add_argument("-k", dest="filter", default="", help="runs only cases whose name contains this text")
+    parser.add_argument("--runs", type=int, default=3, help="processes per case (the best time is used)")
+    parser.add_argument("--no-latex", action="store_true", help="skips the cases which need LaTeX")
+    parser.add_argument("--save", help="saves the results as json baseline")
+    parser.add_argument("--compare", help="json baseline to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative increase (0.2: 20 %%)")
+    parser.add_argument("--list", action="store_true", help="lists the cases")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_case(args.child)))
+        return 0
+    latex = not args.no_latex and shutil.which("pdflatex") is not None
+    names = [name for name in CASES if args.filter in name]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    results = {}
+    failed = []
+    print("%-40s %10s %10s %12s" % ("case", "time [ms]", "RSS [MB]", "file [kB]"))
+    for name in names:
+        if CASES[name][1] and not latex:
+            print("%-40s skipped (no LaTeX)" % name)
+            continue
+        try:
+            result = results[name] = measure(name, args.runs)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            print("%-40s failed" % name)
+            failed.append(str(e))
+            continue
+        print("%-40s %10.2f %10s %12s" % (name, 1000 * result["time"],
+                                          "%.1f" % result["rss_mb"] if result["rss_mb"] is not None else "-",
+                                          "%.1f" % (result["size"] / 1024) if result["size"] is not None else "-"))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"environment": _environment(), "latex": latex, "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nregressions:\n  " + "\n  ".join(regressions))
+            return 1
+    if failed:
+        print("\n" + "\n".join(failed))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
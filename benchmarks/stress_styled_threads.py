@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import threading
+
+import numpy as np
+from matplotlib.image import imread
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))      # add path to figure.py
+from figure import make_figure, release_figure, save_figure
+
+"""
+Stress test of make_figure(scoped=True): many threads create, plot and save
+figures with different sizes, fonts and line styles at once (in debug mode).
+Every figure is checked against its own settings:
+size of the saved png, font size of the axis label, color of the first line.
+usage: python stress_styled_threads.py [threads] [figures per thread] [scoped: 1 or 0]
+
+With scoped=0 the figures use the global setup() and the threads overwrite
+each other's settings, so errors are expected.
+"""
+
+threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+figures = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+scoped = sys.argv[3] != "0" if len(sys.argv) > 3 else True
+DPI = 50
+x = np.linspace(0, 1, 50)
+errors = []
+
+
+def render(worker):
+    width, font_size, color = 2 + worker, 6 + worker, ["r", "b", "g", "k"][worker % 4]
+
+    def plots(fig, ax):
+        ax.plot(x, x ** worker)
+        ax.set_xlabel("x")
+
+    for i in range(figures):
+        try:
+            fig, ax = make_figure(width=width, height=2, unit="in", font_size=font_size,
+                                  serif=worker % 2 == 0, colors=[color], linestyles=["-"],
+                                  plots=plots, debug=True, pyplot=False, reuse=True, scoped=scoped)
+            path = os.path.join(folder, "stress_%d.png" % worker)
+            save_figure(fig, path, DPI)
+            height_pixels, width_pixels = imread(path).shape[:2]
+            checks = {"png width": (width_pixels, width * DPI),
+                      "label size": (ax.xaxis.label.get_fontsize(), font_size),
+                      "line color": (ax.lines[0].get_color(), color)}
+            for name, (value, expected) in checks.items():
+                if value != expected:
+                    errors.append("thread %d figure %d: %s %s != %s" % (worker, i, name, value, expected))
+            release_figure(fig, reuse=True)
+        except Exception as e:
+            errors.append("thread %d figure %d: %r" % (worker, i, e))
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        workers = [threading.Thread(target=render, args=(w,)) for w in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        print("%d threads x %d figures (scoped=%s): %.1f s, %d errors"
+              % (threads, figures, scoped, time.perf_counter() - start, len(errors)))
+        for e in errors[:10]:
+            print("  " + e)
+        sys.exit(1 if errors and scoped else 0)
@@ -1,16 +1,31 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import numpy as np
-from matplotlib import cm  # Colormaps
-import matplotlib.ticker as ticker
+import hashlib
+from lazyimport import lazy_import
+
+import profiling
+
+# heavy modules are imported on first use (see lazyimport.py)
+np = lazy_import("numpy")
+mpl = lazy_import("matplotlib")
+formatters = lazy_import("formatters")
+
+GRID_CACHE_SIZE = 64  # maximum number of grids in the grid geometry cache
+
+# step (None if not uniform) and cell edges of coordinate arrays by hash (see grid_geometry)
+_grid_cache = {}
 
 def generate_formatter(arr, decimals = 2):
     """
         Generate a formatter which returns strings of values from a given array with the given decimal precision
+        (formats one value per call, contourplot uses formatters.IndexFormatter),
+        values outside of the array get no label
     """
     def formatter(value, pos=None):
-        new_v = arr[int(value) if value < len(arr) else 0]
+        if not 0 <= value < len(arr):
+            return ""
+        new_v = arr[int(value)]
         if new_v == 0:
             return 0
         if abs(new_v) < 1e-3 or abs(new_v) >= 1e3:
@@ -19,8 +34,182 @@ def generate_formatter(arr, decimals = 2):
             return f"%.{decimals}f" % new_v
     return formatter
 
+def target_pixels(fig, ax, dpi = None):
+    """
+        Returns the number of pixels (width, height) of the axes in the saved figure
+    """
+    if dpi is None:
+        dpi = mpl.rcParams["savefig.dpi"]
+        dpi = fig.dpi if dpi == "figure" else dpi
+    position = ax.get_position()
+    fig_width, fig_height = fig.get_size_inches()
+    return (max(1, int(np.ceil(position.width * fig_width * dpi))),
+            max(1, int(np.ceil(position.height * fig_height * dpi))))
+
+def downsample(z, factor_x, factor_y, method = "mean", center = 0):
+    """
+        Reduces z to blocks of factor_x x factor_y values (the last blocks can be smaller)
+
+        - method: "mean" (average of a block), "nearest" (central value of a block)
+          or "minmax" (minimum or maximum of a block, whichever is further away from center,
+          so that extreme values are kept)
+    """
+    starts_x = np.arange(0, z.shape[0], factor_x)
+    starts_y = np.arange(0, z.shape[1], factor_y)
+    if method == "nearest":
+        return z[np.minimum(starts_x + factor_x//2, z.shape[0]-1)][:, np.minimum(starts_y + factor_y//2, z.shape[1]-1)]
+    if method == "mean":
+        sums = np.add.reduceat(np.add.reduceat(z, starts_x, axis=0, dtype=float), starts_y, axis=1)
+        counts = np.outer(np.diff(np.append(starts_x, z.shape[0])), np.diff(np.append(starts_y, z.shape[1])))
+        return sums / counts
+    if method == "minmax":
+        block_min = np.minimum.reduceat(np.minimum.reduceat(z, starts_x, axis=0), starts_y, axis=1)
+        block_max = np.maximum.reduceat(np.maximum.reduceat(z, starts_x, axis=0), starts_y, axis=1)
+        return np.where(np.abs(block_max - center) >= np.abs(block_min - center), block_max, block_min)
+    raise ValueError("ERROR: downsample must be 'mean', 'minmax' or 'nearest'")
+
+def iterate_chunks(z, chunk_size = 2**22, multiple = 1, multiple_y = 1):
+    """
+        Yields z in bands of rows (first index) with about chunk_size values, every band is an
+        iterator over its blocks as numpy arrays (a single block of whole rows, or several blocks
+        along the second index if one row is larger than chunk_size),
+        so z can also be a np.memmap or any other array source which supports slicing
+
+        - multiple: the number of rows of every band (except the last) is a multiple of it
+        - multiple_y: the number of columns of every block (except the last) is a multiple of it
+    """
+    rows = chunk_size // max(1, z.shape[1]) // multiple * multiple
+    if rows >= multiple:
+        for start in range(0, z.shape[0], rows):
+            yield iter([np.asarray(z[start:start + rows])])
+        return
+    # multiple rows are larger than chunk_size: they are also split into blocks of columns
+    columns = max(multiple_y, chunk_size // multiple // multiple_y * multiple_y)
+    for start in range(0, z.shape[0], multiple):
+        yield (np.asarray(z[start:start + multiple, column:column + columns])
+               for column in range(0, z.shape[1], columns))
+
+def z_limits(z, chunk_size = 2**22):
+    """
+        Returns minimum and maximum of z in one pass over blocks of about chunk_size values
+    """
+    zmin, zmax = np.inf, -np.inf
+    for band in iterate_chunks(z, chunk_size):
+        for chunk in band:
+            zmin = min(zmin, np.min(chunk))
+            zmax = max(zmax, np.max(chunk))
+    return zmin, zmax
+
+def contour_image(fig, ax, z, zmin = None, zmax = None, center_around_zero = False,
+                  downsample_method = None, dpi = None, chunk_size = 2**22, factors = None):
+    """
+        Returns the image (z or z downsampled to the pixels of ax), its extent in index units
+        and the color limits of a contourplot (parameters see contourplot)
+
+        - factors: (factor_x, factor_y) size of the downsampled blocks instead of the pixels of ax
+          (the mesh of contourplot keeps its cells)
+    """
+    if center_around_zero or not zmax or not zmin:
+        data_min, data_max = z_limits(z, chunk_size)
+    zmax = zmax or data_max
+    zmin = zmin or data_min
+    if center_around_zero:
+        zmax = max(abs(data_min), abs(data_max))
+        zmin = -zmax
+    if downsample_method is None and (isinstance(z, np.memmap) or not isinstance(z, np.ndarray)):
+        # memmaps and other array sources are reduced to the pixels, so they are never loaded completely
+        downsample_method = "mean"
+    image = None
+    # image blocks are factor_x x factor_y values wide so the ticks stay at the indices of x and y
+    factor_x = factor_y = 1
+    if downsample_method:
+        if factors:
+            factor_x, factor_y = factors
+        else:
+            pixels_x, pixels_y = target_pixels(fig, ax, dpi)
+            factor_x = max(1, z.shape[0] // pixels_x)
+            factor_y = max(1, z.shape[1] // pixels_y)
+        if factor_x > 1 or factor_y > 1:
+            image = np.concatenate([np.concatenate([downsample(chunk, factor_x, factor_y, downsample_method,
+                                                               (zmin + zmax) / 2) for chunk in band], axis=1)
+                                    for band in iterate_chunks(z, chunk_size, factor_x, factor_y)])
+    if image is None:
+        image = np.asarray(z)
+    extent = (-0.5, image.shape[0]*factor_x - 0.5, -0.5, image.shape[1]*factor_y - 0.5)
+    return image, extent, zmin, zmax
+
+def update_contourplot(con, z):
+    """
+        Replaces z of a contourplot without creating a new plot (x and y stay the same)
+
+        - con: image or mesh of the contourplot (e.g. ax.images[0], ax.collections[0] with coordinates=True)
+        - z: new z values with the same shape
+    """
+    # the image can have another shape than z (downsampled to the current size of the axes),
+    # so the shape of z is compared
+    if tuple(z.shape) != con.contourplot_shape:
+        raise ValueError("ERROR: z must have the same shape as the z of the contourplot")
+    image, extent, zmin, zmax = contour_image(con.figure, con.axes, z, **con.contourplot_settings)
+    grid = getattr(con, "contourplot_grid", None)
+    if hasattr(con, "set_extent"):
+        if grid is not None:
+            extent = coordinate_extent(extent, *grid)
+        con.set_data(image.transpose())
+        if tuple(extent) != tuple(con.get_extent()):
+            con.set_extent(extent)
+    else:
+        con.set_array(image.transpose())
+    con.set_clim(zmin, zmax)
+
+def grid_geometry(values):
+    """
+        Returns the step of evenly spaced values (None if they are not evenly spaced)
+        and the edges of the cells around the values (the middle between neighbours).
+        The geometry is cached by the values, so repeated contourplots on the same grid
+        do not compute it again.
+
+        - values: monotonic 1D array of coordinates (x or y of contourplot)
+    """
+    values = np.ascontiguousarray(values, dtype=float)
+    key = (values.shape, hashlib.sha1(values.tobytes()).hexdigest())
+    if key in _grid_cache:
+        return _grid_cache[key]
+    if values.ndim != 1 or values.size == 0:
+        raise ValueError("ERROR: the coordinates of contourplot must be a 1D array")
+    steps = np.diff(values)
+    if values.size > 1 and not (np.all(steps > 0) or np.all(steps < 0)):
+        raise ValueError("ERROR: the coordinates of contourplot must be strictly increasing or decreasing")
+    if values.size == 1:
+        step, edges = 1.0, values + np.array([-0.5, 0.5])
+    else:
+        step = steps[0] if np.allclose(steps, steps[0], rtol=1e-6, atol=0) else None
+        middles = values[:-1] + steps / 2
+        edges = np.concatenate([[values[0] - steps[0] / 2], middles, [values[-1] + steps[-1] / 2]])
+    edges.flags.writeable = False
+    if len(_grid_cache) >= GRID_CACHE_SIZE:
+        _grid_cache.clear()
+    _grid_cache[key] = step, edges
+    return step, edges
+
+def coordinate_extent(extent, x, y):
+    """
+        Converts the extent of contour_image in index units into coordinates of evenly spaced x and y
+    """
+    x_step, y_step = grid_geometry(x)[0], grid_geometry(y)[0]
+    return (x[0] + x_step*extent[0], x[0] + x_step*extent[1], y[0] + y_step*extent[2], y[0] + y_step*extent[3])
+
+def block_edges(edges, size, blocks):
+    """
+        Returns the edges of blocks of size cells (the last block can be smaller),
+        e.g. of an image downsampled by contour_image
+    """
+    block = edges[::size][:blocks + 1]
+    return block if len(block) == blocks + 1 else np.append(block, edges[-1])
+
+@profiling.profiled("contourplot")
 def contourplot(fig, ax, x, y, z, x_label = None, y_label = None, z_label = None, zmin = None, zmax = None,
-                x_decimals = 2, y_decimals = 2, cmap = cm.seismic, center_around_zero = False):
+                x_decimals = 2, y_decimals = 2, cmap = "seismic", center_around_zero = False,
+                downsample_method = None, dpi = None, chunk_size = 2**22, coordinates = False):
     """
     The function generates a contourplot
 
@@ -29,29 +218,75 @@ def contourplot(fig, ax, x, y, z, x_label = None, y_label = None, z_label = None
     - x: x values
     - y: y values
     - z: z values, should be a 2D array with shape [x.size,y.size]
-    - cmap: matplotlib colormap (see https://matplotlib.org/stable/gallery/color/colormap_reference.html)
+      (can also be a np.memmap or another array source with shape and slicing, e.g. a h5py dataset)
+    - cmap: matplotlib colormap or its name (see https://matplotlib.org/stable/gallery/color/colormap_reference.html)
     - z_label: label along the colormap
     - center_around_zero: if True, it centers the colormap around zero (dafault is False)
-    """
-    zmax = zmax or np.max(z)
-    zmin = zmin or np.min(z)
-    if center_around_zero:
-        zmax = np.max(np.abs(z))
-        zmin = -zmax
-    con = ax.imshow(z.transpose(), cmap = cmap, vmin = zmin, vmax = zmax, aspect = "auto", origin = "lower")
+    - downsample_method: if z has more values than the axes has pixels in the saved figure,
+      z is reduced to the pixel grid before plotting: "mean", "minmax" (keeps extreme values)
+      or "nearest" (default None: no reduction of numpy arrays, "mean" for memmaps and other
+      array sources, so they are not loaded into memory completely)
+    - dpi: resolution of the saved figure used for downsample_method (default savefig.dpi)
+    - chunk_size: z is read in blocks of about chunk_size values to compute its limits and
+      to downsample it, so the memory stays bounded for large memmaps
+    - coordinates: the axes show the coordinates x and y (instead of the indices of z
+      with the labels of x and y), so ticks are at round coordinates and unevenly spaced
+      x and y are drawn correctly: evenly spaced grids are drawn as image,
+      other grids as mesh with the cell edges between the coordinates (see grid_geometry),
+      x_decimals and y_decimals are not used (default False: index axes)
 
-    my_x_formatter = generate_formatter(x, decimals = x_decimals)
-    my_y_formatter = generate_formatter(y, decimals = y_decimals)
-    ax.xaxis.set_major_formatter(ticker.FuncFormatter(my_x_formatter))
-    ax.yaxis.set_major_formatter(ticker.FuncFormatter(my_y_formatter))
+    With profiling the phases contour_image, imshow (or pcolormesh) and colorbar are measured (see profiling.py).
+    """
+    with profiling.phase("contour_image") as p:
+        image, extent, zmin_image, zmax_image = contour_image(fig, ax, z, zmin, zmax, center_around_zero,
+                                                              downsample_method, dpi, chunk_size)
+        if p:
+            p.add(values=int(np.prod(z.shape)), pixels=int(image.size))
+    if coordinates:
+        (x_step, x_edges), (y_step, y_edges) = grid_geometry(x), grid_geometry(y)
+    if not coordinates or (x_step and y_step):
+        if coordinates:
+            extent = coordinate_extent(extent, x, y)
+        with profiling.phase("imshow"):
+            con = ax.imshow(image.transpose(), cmap = cmap, vmin = zmin_image, vmax = zmax_image, aspect = "auto",
+                            origin = "lower", extent = extent)
+    else:
+        # blocks of the downsampled image (see contour_image)
+        factor_x = int(round((extent[1] + 0.5) / image.shape[0]))
+        factor_y = int(round((extent[3] + 0.5) / image.shape[1]))
+        with profiling.phase("pcolormesh"):
+            con = ax.pcolormesh(block_edges(x_edges, factor_x, image.shape[0]),
+                                block_edges(y_edges, factor_y, image.shape[1]), image.transpose(),
+                                cmap = cmap, vmin = zmin_image, vmax = zmax_image, shading = "flat")
+    # used by update_contourplot
+    con.contourplot_settings = dict(zmin = zmin, zmax = zmax, center_around_zero = center_around_zero,
+                                    downsample_method = downsample_method, dpi = dpi, chunk_size = chunk_size)
+    con.contourplot_grid = (np.asarray(x), np.asarray(y)) if coordinates else None
+    con.contourplot_shape = tuple(z.shape)
+    if not hasattr(con, "set_extent"):
+        con.contourplot_settings["factors"] = (factor_x, factor_y)
 
-    ax.set_xlim((0, len(x)-1))
-    ax.set_ylim((0, len(y)-1))
+    # the german number format of make_figure(de=True) is kept
+    decimal_comma = getattr(ax.xaxis.get_major_formatter(), "decimal_comma", False)
+    if coordinates:
+        # the formatters of make_figure are kept (with their scientific notation)
+        for axis in [ax.xaxis, ax.yaxis]:
+            if not isinstance(axis.get_major_formatter(), formatters.NumberFormatter):
+                axis.set_major_formatter(formatters.NumberFormatter(decimal_comma))
+        ax.set_xlim((x_edges[0], x_edges[-1]))
+        ax.set_ylim((y_edges[0], y_edges[-1]))
+    else:
+        ax.xaxis.set_major_formatter(formatters.IndexFormatter(x, x_decimals, decimal_comma))
+        ax.yaxis.set_major_formatter(formatters.IndexFormatter(y, y_decimals, decimal_comma))
+        ax.set_xlim((0, len(x)-1))
+        ax.set_ylim((0, len(y)-1))
     if x_label:
         ax.set_xlabel(x_label)
     if y_label:
         ax.set_ylabel(y_label)
-    cb = fig.colorbar(con, shrink=0.7, aspect=10)
+    with profiling.phase("colorbar"):
+        cb = fig.colorbar(con, shrink=0.7, aspect=10)
+        cb.ax.yaxis.set_major_formatter(formatters.NumberFormatter(decimal_comma))
     if z_label:
         cb.set_label(z_label)
     return fig, ax
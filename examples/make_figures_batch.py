@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))      # add path to figure.py
+"""
+you need to specify the relative path to figure.py
+this can be done through an absolute path in sys.path.append(...)
+or a relative path (in this case '..') as you can see above
+"""
+
+from figure import make_figures   # import functions
+
+x = np.linspace(0, 20, 300)
+
+
+def plot_sin(fig, ax):
+    ax.plot(x, np.sin(x), label="sin")
+    ax.legend()
+    ax.set_xlabel("x values")
+    ax.set_ylabel("y values")
+
+
+def plot_cos(fig, ax):
+    ax.plot(x, np.cos(x), label="cos")
+    ax.legend()
+    ax.set_xlabel("x values")
+    ax.set_ylabel("y values")
+
+
+if __name__ == "__main__":
+    folder = os.path.dirname(__file__)
+    specs = [dict(width=10, height=7, unit="cm", plots=plot_sin, output_file=os.path.join(folder, "batch_sin.pdf")),
+             dict(width=10, height=7, unit="cm", serif=False, plots=plot_cos, output_file=os.path.join(folder, "batch_cos.pdf"))]
+    results = make_figures(specs, workers=2)
+    # results = make_figures(specs, workers=2, debug=True)
+    for result in results:
+        print(result["output_file"], "ok" if result["error"] is None else result["error"])
+"""
+make_figures renders many figures in parallel. Every entry of specs contains
+the parameters of make_figure (see make_figure_other_axes_and_save_figure.py).
+Each worker process calls setup() once when it starts.
+
+Attention:
+* the plots functions must be defined at module level (not inside a function),
+  because they are sent to the worker processes
+* the call must be protected by if __name__ == "__main__":
+* make_figures returns a list of dicts with the keys output_file, error
+  (None if the figure was saved) and latex_roundtrips
+"""
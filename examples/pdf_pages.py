@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import functools
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))      # add path to figure.py
+"""
+you need to specify the relative path to figure.py
+this can be done through an absolute path in sys.path.append(...)
+or a relative path (in this case '..') as you can see above
+"""
+
+from pdfpages import PdfPages   # import functions
+
+x = np.linspace(0, 20, 300)
+
+
+def plot_frequency(fig, ax, frequency):
+    ax.plot(x, np.sin(frequency * x), label="f = %g" % frequency)
+    ax.legend()
+    ax.set_xlabel("x values")
+    ax.set_ylabel("y values")
+
+
+output_file = os.path.join(os.path.dirname(__file__), "pdf_pages.pdf")
+with PdfPages(output_file) as pdf:
+# with PdfPages(output_file, debug=True) as pdf:
+    for frequency in [0.5, 1, 2, 4]:
+        pdf.add_page(functools.partial(plot_frequency, frequency=frequency),
+                     width=10, height=7, unit="cm", tight_layout=True)
+"""
+PdfPages saves many figures as pages of one pdf file.
+add_page takes the plots function and the parameters of make_figure
+(see make_figure_other_axes_and_save_figure.py), an existing figure can be
+added with pdf.savefig(fig).
+
+Attention:
+* the figures are freed after their page is written, do not use them afterwards
+* LaTeX runs once at the end of the with block, so errors in the LaTeX code
+  of a label are only reported there
+"""
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))      # add path to figure.py
+"""
+you need to specify the relative path to figure.py
+this can be done through an absolute path in sys.path.append(...)
+or a relative path (in this case '..') as you can see above
+"""
+
+from figure import make_figure   # import functions
+from contourplots import contourplot
+from profiling import TimingAggregator
+
+x = np.linspace(0, 1, 200)
+y = np.linspace(0, 2, 100)
+z = np.sin(10 * x)[:, None] * np.cos(5 * y)[None, :]
+
+
+def plot_lines(fig, ax):
+    ax.plot(x, np.sin(10 * x), label="sin")
+    ax.legend()
+    ax.set_xlabel("x values")
+    ax.set_ylabel("y values")
+
+
+def plot_contour(fig, ax):
+    contourplot(fig, ax, x, y, z, "x values", "y values", "z values")
+
+
+folder = os.path.dirname(__file__)
+with TimingAggregator() as timings:
+    make_figure(width=10, unit="cm", plots=plot_lines, output_file=os.path.join(folder, "profiling_lines.pdf"))
+    make_figure(width=10, unit="cm", plots=plot_contour, output_file=os.path.join(folder, "profiling_contour.pdf"))
+    # make_figure(width=10, unit="cm", plots=plot_contour, output_file=..., debug=True)
+print(timings.report())
+timings.to_csv(os.path.join(folder, "profiling.csv"))
+"""
+TimingAggregator collects the time of every phase of make_figure (setup, subplots,
+adjust_axes, plots, layout, save_figure with savefig and latex) and of contourplot,
+nested phases are named like make_figure/plots/contourplot.
+Every phase also counts the LaTeX measurements (latex_roundtrips) and LaTeX runs (latex_runs),
+save_figure counts the drawn artists and the written bytes.
+
+report() shows the summary by phase, to_csv and to_json save every single event.
+It also works for make_figures: the phases of the worker processes are collected, too.
+Without a TimingAggregator (or another hook, see profiling.add_hook) nothing is measured.
+"""
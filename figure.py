@@ -1,31 +1,463 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-import locale
-import numpy as np
-import datetime
 import os
-import platform
-from cycler import cycler
+import sys
+import math
+import functools
+import hashlib
+import json
+import re
+import weakref
+import contextlib
+import threading
+import gc
+from lazyimport import lazy_import
+
+import profiling
+
+# heavy modules are imported on first use (see lazyimport.py)
+plt = lazy_import("matplotlib.pyplot")
+mpl = lazy_import("matplotlib")
+np = lazy_import("numpy")
+shutil = lazy_import("shutil")
+subprocess = lazy_import("subprocess")
+tempfile = lazy_import("tempfile")
+traceback = lazy_import("traceback")
+multiprocessing = lazy_import("multiprocessing")
+futures = lazy_import("concurrent.futures")
+shared_memory = lazy_import("multiprocessing.shared_memory")
+mmap = lazy_import("mmap")
+cycler = lazy_import("cycler")
+backend_agg = lazy_import("matplotlib.backends.backend_agg")
+backend_pgf = lazy_import("matplotlib.backends.backend_pgf")
+mcollections = lazy_import("matplotlib.collections")
+mfigure = lazy_import("matplotlib.figure")
+mimage = lazy_import("matplotlib.image")
+mlines = lazy_import("matplotlib.lines")
+mpatches = lazy_import("matplotlib.patches")
+mtext = lazy_import("matplotlib.text")
+outputcache = lazy_import("outputcache")
+formatters = lazy_import("formatters")
 
 POINT_TO_INCHES = 1.0/72.27
 CM_TO_INCHES = 1.0/2.54
-GOLDEN_MEAN = (np.sqrt(5)-1.0)/2.0
+GOLDEN_MEAN = (math.sqrt(5)-1.0)/2.0
 DEFAULT_COLORS = ['r', 'b', 'g', 'orange', 'k', 'cyan']
 DEFAULT_LINESTYLES = ['-', '--', ':', '-.', (0, (1, 4.5)), (0, (3, 1, 1, 1, 1, 1))]
+VECTOR_FORMATS = ["pdf", "pgf", "svg", "eps", "ps"]
+BYTES_PER_ELEMENT = 40  # rough size of one point or path element in vector output
+LAYOUT_PASSES = 4  # maximum number of measurements of the decorations in layout
+FIGURE_POOL_SIZE = 4  # maximum number of unused figures kept per figure size
+FIGURE_POOL_TOTAL = 16  # maximum number of unused figures kept of all sizes
+VIEWER_CLEANUP_DELAY = 60  # seconds a file of show is kept after its viewer was closed
+SHARED_ARRAY_MIN_BYTES = 2**20  # make_figures passes arrays from this size in shared memory
+
+FORMAT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "python-plots", "formats")
+FORMAT_CACHE_SIZE = 16  # maximum number of format files in FORMAT_CACHE_DIR
+LATEX_MANAGER_POOL_SIZE = 4  # maximum number of running LaTeX processes (one per preamble)
+TEXT_METRICS_CACHE_SIZE = 100000  # maximum number of measured texts in the text metrics cache
+LATEX_BATCH_SIZE = 50  # texts sent to LaTeX before their answers are read (see _measure_latex)
+
+# running LaTeX processes of the pgf backend, one per preamble (least recently used first)
+_latex_managers = {}
+_latex_managers_lock = threading.RLock()
+# precompiled format files (see setup(format_cache=True)), one per preamble
+_format_files = {}
+# nesting depth of _latex_pool and the method of LatexManager it replaces meanwhile
+_latex_pool_depth = 0
+_stock_get_cached_or_new = None
+# number of requests to LaTeX processes for text measurement
+_latex_roundtrips = 0
+# number of LaTeX runs which compile documents or formats
+_latex_runs = 0
+# measured text sizes (width, height, descent in points) by preamble/backend, font and text
+# (oldest first, see _store_text_metrics)
+_text_metrics = {}
+# artists which are never rasterized by rasterize_heavy_artists
+_vector_artists = weakref.WeakSet()
+# only one thread at a time changes rcParams (see styled)
+_style_lock = threading.RLock()
+# unused figures without pyplot for reuse (see release_figure), by size, dpi and canvas
+# (least recently used first)
+_figure_pool = {}
+# shared memory created by share_array in this process: name -> [segment, reference count]
+_shared_segments = {}
+# shared memory of other processes opened by SharedArray.array, by name
+_attached_segments = {}
 
 def align_legend_right(fig, legend):
-    # Get the renderer instance
-    renderer = fig.canvas.get_renderer()
+    # Get the width of all labels in pixels (measured together, see text_extents)
+    widths = [w * fig.dpi / 72 for w, h, d in text_extents(fig, legend.get_texts())]
     # Get the width of the widest label
-    shift = max([t.get_window_extent(renderer).width for t in legend.get_texts()])
+    shift = max(widths)
 
     # Set the horizontal alignment and position of all labels
-    for t in legend.get_texts():
+    for t, width in zip(legend.get_texts(), widths):
         t.set_ha('right') # ha is alias for horizontalalignment
-        t.set_position((shift - t.get_window_extent(renderer).width,0))
+        t.set_position((shift - width,0))
+
+
+@functools.lru_cache()
+def _format_latex_manager():
+    """
+    returns the class of LaTeX processes of the pgf backend which load the preamble
+    from a precompiled format file (defined on first use to import the pgf backend lazily)
+    """
+    class FormatLatexManager(backend_pgf.LatexManager):
+
+        def __init__(self, format_file):
+            self.format_file = format_file
+            super().__init__()
+
+        def _build_latex_header(self):
+            # the first line "&name" lets TeX load the format instead of parsing the preamble
+            return "\n".join(["&" + os.path.splitext(self.format_file)[0],
+                              r"\begin{document}",
+                              r"\typeout{pgf_backend_query_start}"])
+
+    return FormatLatexManager
+
+
+# private attributes of the pgf backend used for the LaTeX processes of latex_manager,
+# the measurement of texts and the compilation of pdf and png by save_figure
+_PGF_POOL = ("LatexManager._get_cached_or_new", "LatexManager._build_latex_header")
+_PGF_METRICS = _PGF_POOL + ("LatexManager._get_box_metrics", "_escape_and_apply_props")
+_PGF_BATCH = _PGF_METRICS + ("LatexManager._stdin_writeln", "LatexManager._expect_prompt")
+_PGF_DOCUMENT = _PGF_POOL + ("_metadata_to_str", "_create_pdf_info_dict", "_get_preamble", "_DOCUMENTCLASS")
+
+
+@functools.lru_cache()
+def _pgf_has(names):
+    """
+    checks that the pgf backend has all private attributes names (e.g. "LatexManager._get_box_metrics"),
+    otherwise the stock path of matplotlib is used instead of the faster one of this module
+    """
+    for name in names:
+        value = backend_pgf
+        for part in name.split("."):
+            if not hasattr(value, part):
+                return False
+            value = getattr(value, part)
+    return True
+
+
+@functools.lru_cache()
+def _tex_version(texsystem):
+    """
+    returns the version string of the TeX engine
+    """
+    output = subprocess.run([texsystem, "--version"], capture_output=True, text=True).stdout
+    return output.splitlines()[0] if output else ""
+
+
+def _prune_format_cache():
+    """
+    removes the least recently used format files if there are more than FORMAT_CACHE_SIZE
+    """
+    files = [os.path.join(FORMAT_CACHE_DIR, f) for f in os.listdir(FORMAT_CACHE_DIR) if f.endswith(".fmt")]
+    files.sort(key=os.path.getmtime, reverse=True)
+    for file in files[FORMAT_CACHE_SIZE:]:
+        try:
+            os.remove(file)
+        except FileNotFoundError:
+            pass  # removed by another process
+
+
+def format_file(header):
+    """
+    Returns the path of a precompiled LaTeX format which contains everything of the
+    pgf backend's LaTeX header (or of the documents of save_figure) before \\begin{document}
+    except \\hypersetup commands, so figures with different pdf metadata share one format.
+    The format is compiled once and stored in FORMAT_CACHE_DIR under a hash of the
+    preamble and the version of the TeX engine, so it is rebuilt automatically when one
+    of them changes. Only the FORMAT_CACHE_SIZE most recently used formats are kept.
+
+    - header: LaTeX header of the pgf backend (see latex_manager) or preamble of a document
+    """
+    texsystem = mpl.rcParams["pgf.texsystem"]
+    preamble, _ = _split_hypersetup(header.split(r"\begin{document}")[0])
+    key = hashlib.sha256("\n".join([preamble, texsystem, _tex_version(texsystem)]).encode("utf-8")).hexdigest()[:32]
+    path = os.path.join(FORMAT_CACHE_DIR, key + ".fmt")
+    if os.path.exists(path):
+        os.utime(path)  # mark as recently used
+        return path
+
+    global _latex_runs
+    _latex_runs += 1
+    os.makedirs(FORMAT_CACHE_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, key + ".tex"), "w", encoding="utf-8") as f:
+            f.write(preamble + "\n" + r"\dump" + "\n")
+        result = subprocess.run([texsystem, "-ini", "-jobname=" + key, "-halt-on-error",
+                                 "-no-shell-escape", "&" + texsystem, key + ".tex"],
+                                cwd=tmpdir, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise backend_pgf.LatexError("LaTeX could not compile the preamble to a format file", result.stdout)
+        # move atomically, another process may compile the same format at the same time
+        shutil.move(os.path.join(tmpdir, key + ".fmt"), path + ".tmp" + str(os.getpid()))
+        os.replace(path + ".tmp" + str(os.getpid()), path)
+    _prune_format_cache()
+    return path
+
+
+def _latex_manager_alive(manager):
+    """
+    checks if the LaTeX process of a manager is still running
+    """
+    return manager.latex is None or manager.latex.poll() is None
+
+
+def _probe_latex_manager(manager):
+    """
+    measures a test string without cache to check that LaTeX still answers
+    """
+    if not _pgf_has(_PGF_METRICS):
+        return True
+    try:
+        type(manager)._get_box_metrics(manager, r"\relax")
+    except Exception:
+        return False
+    return True
+
+
+def _close_latex_manager(manager):
+    """
+    stops the LaTeX process of a manager and removes its temporary folder
+    """
+    for finalizer in ["_finalize_latex", "_finalize_tmpdir"]:
+        if hasattr(manager, finalizer):
+            getattr(manager, finalizer)()
+
+
+def latex_manager(check=False):
+    """
+    Returns the running LaTeX process of the pgf backend for the current preamble.
+    There is one process per preamble (see setup) and it is kept alive and
+    reused for all figures with the same preamble. A process that died is restarted.
+    The pgf backend uses these processes while make_figure, save_figure and layout
+    draw a figure (see _latex_pool).
+    At most LATEX_MANAGER_POOL_SIZE processes are kept, the least recently used one
+    is stopped when a new preamble needs a process (e.g. different metadata per figure).
+    If setup was called with format_cache=True, the process starts from the
+    precompiled format of the preamble (see format_file).
+
+    - check: additionally sends a test string to the process and restarts it
+      if it does not answer (health check)
+    """
+    header = backend_pgf.LatexManager._build_latex_header()
+    with _latex_managers_lock:
+        # moved to the end as most recently used
+        manager = _latex_managers.pop(header, None)
+        if manager is not None and (not _latex_manager_alive(manager)
+                                    or (check and not _probe_latex_manager(manager))):
+            _close_latex_manager(manager)
+            manager = None
+        if manager is None:
+            if header in _format_files and " " not in _format_files[header]:
+                manager = _format_latex_manager()(_format_files[header])
+            else:
+                manager = backend_pgf.LatexManager()
+            if _pgf_has(_PGF_METRICS):
+                # measure texts through the text metrics cache of all figures
+                manager._get_box_metrics = functools.partial(_box_metrics, manager, _preamble_key(header))
+        _latex_managers[header] = manager
+        while len(_latex_managers) > LATEX_MANAGER_POOL_SIZE:
+            _close_latex_manager(_latex_managers.pop(next(iter(_latex_managers))))
+    return manager
+
+
+def latex_roundtrips():
+    """
+    Returns the number of requests to LaTeX for text measurement since the
+    start of the program (texts in the text metrics cache are not measured again,
+    texts measured together with text_extents count as one request)
+    """
+    return _latex_roundtrips
+
+
+def latex_runs():
+    """
+    Returns the number of LaTeX runs (compiled figures and format files)
+    since the start of the program
+    """
+    return _latex_runs
+
+
+# recorded for every phase of make_figure, save_figure and contourplot (see profiling.py)
+profiling.register_counter("latex_roundtrips", latex_roundtrips)
+profiling.register_counter("latex_runs", latex_runs)
+
+
+def _preamble_key(header):
+    """
+    short hash of the LaTeX header for the keys of the text metrics cache
+    """
+    return hashlib.sha256(header.encode("utf-8")).hexdigest()[:16]
+
+
+def _store_text_metrics(key, metrics):
+    """
+    adds a measured text to the text metrics cache and removes the oldest
+    entries if it contains more than TEXT_METRICS_CACHE_SIZE texts
+    """
+    _text_metrics[key] = metrics
+    while len(_text_metrics) > TEXT_METRICS_CACHE_SIZE:
+        del _text_metrics[next(iter(_text_metrics))]
+    return metrics
+
+
+def _box_metrics(manager, preamble_key, tex):
+    """
+    measures a LaTeX command with the text metrics cache (replaces LatexManager._get_box_metrics)
+    """
+    global _latex_roundtrips
+    key = preamble_key + "|" + tex
+    if key in _text_metrics:
+        return _text_metrics[key]
+    _latex_roundtrips += 1
+    return _store_text_metrics(key, type(manager)._get_box_metrics(manager, tex))
+
+
+def _measure_latex(texs):
+    """
+    measures many LaTeX commands with few requests to the LaTeX process
+    and stores the results in the text metrics cache
+    (LaTeX is only started if a text is not in the cache)
+    """
+    global _latex_roundtrips
+    preamble_key = _preamble_key(backend_pgf.LatexManager._build_latex_header())
+    missing = list(dict.fromkeys(tex for tex in texs if preamble_key + "|" + tex not in _text_metrics))
+    if not missing:
+        return
+    manager = latex_manager()
+    if not _pgf_has(_PGF_BATCH):
+        for tex in missing:
+            manager._get_box_metrics(tex)
+        return
+    # the texts are sent in batches of LATEX_BATCH_SIZE and the answers of a batch are read
+    # before the next one is sent, so the pipes to and from LaTeX can not fill up
+    for start in range(0, len(missing), LATEX_BATCH_SIZE):
+        batch = missing[start:start + LATEX_BATCH_SIZE]
+        _latex_roundtrips += 1
+        for tex in batch:
+            manager._stdin_writeln(r"{\catcode`\^=\active\catcode`\%%=\active\sbox0{%s}"
+                                   r"\typeout{\the\wd0,\the\ht0,\the\dp0}}" % tex)
+        for tex in batch:
+            try:
+                answer = manager._expect_prompt()
+                width, height, offset = answer.splitlines()[-3].split(",")
+            except Exception as err:
+                raise ValueError("Error measuring {}".format(tex)) from err
+            w, h, o = float(width[:-2]), float(height[:-2]), float(offset[:-2])
+            _store_text_metrics(preamble_key + "|" + tex, (w, h + o, o))
+
+
+def _text_lines(texts):
+    """
+    returns the lines (text, font properties) of all visible, non-empty texts
+    """
+    return [(line, t.get_fontproperties()) for t in texts if t.get_visible()
+            for line in t.get_text().split("\n") if line]
+
+
+def text_extents(fig, texts):
+    """
+    Returns (width, height, descent) in points of every text artist (e.g. legend.get_texts()).
+    The sizes are stored in a cache by text, font properties and LaTeX preamble,
+    which is shared by all figures of the program (see save_text_metrics).
+    With the pgf backend all texts which are not in the cache are measured
+    with one request to LaTeX (per LATEX_BATCH_SIZE texts).
+    """
+    if isinstance(fig.canvas, backend_pgf.FigureCanvasPgf) and _pgf_has(_PGF_METRICS):
+        texs = [backend_pgf._escape_and_apply_props(t.get_text(), t.get_fontproperties()) for t in texts]
+        _measure_latex(texs)
+        preamble_key = _preamble_key(backend_pgf.LatexManager._build_latex_header())
+        # texts which were removed from the full cache in the meantime are measured again
+        return [_text_metrics.get(preamble_key + "|" + tex) or latex_manager()._get_box_metrics(tex)
+                for tex in texs]
+
+    renderer = fig.canvas.get_renderer()
+    extents = []
+    for t in texts:
+        prop = t.get_fontproperties()
+        text, ismath = t._preprocess_math(t.get_text())
+        key = "|".join([type(renderer).__name__, prop.get_fontconfig_pattern(), str(ismath), text])
+        if key not in _text_metrics:
+            w, h, d = renderer.get_text_width_height_descent(text, prop, ismath)
+            scale = 72 / renderer.dpi
+            extents.append(_store_text_metrics(key, (w * scale, h * scale, d * scale)))
+        else:
+            extents.append(_text_metrics[key])
+    return extents
+
+
+def prefetch_text_metrics(fig):
+    """
+    Measures all texts of a figure (labels, tick labels, legends, ...) which are
+    not in the text metrics cache with one request to LaTeX per LATEX_BATCH_SIZE texts
+    (only with the pgf backend),
+    so saving the figure does not need a request to LaTeX for every text
+    """
+    if not isinstance(fig.canvas, backend_pgf.FigureCanvasPgf) or not _pgf_has(_PGF_METRICS):
+        return
+    texts = set(fig.findobj(mtext.Text))
+    for ax in fig.axes:
+        texts.update(ax.get_xticklabels() + ax.get_yticklabels())
+    _measure_latex([backend_pgf._escape_and_apply_props(line, prop) for line, prop in _text_lines(texts)])
+
+
+def save_text_metrics(path):
+    """
+    saves the text metrics cache to a json file
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(_text_metrics, f)
+
+
+def load_text_metrics(path):
+    """
+    adds the text metrics of a json file (see save_text_metrics) to the cache
+    """
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for key, metrics in json.load(f).items():
+                _store_text_metrics(key, tuple(metrics))
+
+
+@contextlib.contextmanager
+def _latex_pool(fig=None):
+    """
+    Context manager which lets the pgf backend use the LaTeX processes of latex_manager
+    instead of starting a new process every time the preamble changes
+    (with fig only if the figure has the canvas of the pgf backend).
+    LatexManager is restored at the end of the outermost block, it is not changed
+    if matplotlib does not have the private methods used here (see _pgf_has).
+    """
+    global _latex_pool_depth, _stock_get_cached_or_new
+    if fig is not None and not ("matplotlib.backends.backend_pgf" in sys.modules
+                                and isinstance(fig.canvas, backend_pgf.FigureCanvasPgf)):
+        yield
+        return
+    if not _pgf_has(_PGF_POOL):
+        yield
+        return
+    with _latex_managers_lock:
+        if _latex_pool_depth == 0:
+            _stock_get_cached_or_new = backend_pgf.LatexManager.__dict__.get("_get_cached_or_new")
+            backend_pgf.LatexManager._get_cached_or_new = classmethod(lambda cls: latex_manager())
+        _latex_pool_depth += 1
+    try:
+        yield
+    finally:
+        with _latex_managers_lock:
+            _latex_pool_depth -= 1
+            if _latex_pool_depth == 0:
+                if _stock_get_cached_or_new is None:
+                    del backend_pgf.LatexManager._get_cached_or_new
+                else:
+                    backend_pgf.LatexManager._get_cached_or_new = _stock_get_cached_or_new
+
 
 def calculate_figure_size(width, height, unit):
     """
@@ -47,35 +479,18 @@ def calculate_figure_size(width, height, unit):
     return fig_width, fig_height
 
 
-def setup(width=None, height=None, unit=None, serif=True, font_size=10, debug=False, set_lines = True, metadata=None, colors = None, linestyles = None):
+def style(width=None, height=None, unit=None, serif=True, font_size=10, set_lines=True, metadata=None,
+          colors=None, linestyles=None):
     """
-    The function overwrites the default values for font, font size, figure size
-
-    - width: width of the figure
-    - height: height of the figure
-    - unit: unit of width and height ("in", "pt" or "cm")
-    - serif: with or without serifs
-    - font_size: size of the font
-    - set_lines: sets the style of lines (linestyle and color)
-    - metadata: save metadata for the figure. use a dict
-      (see metadata at
-      https://matplotlib.org/stable/api/_as_gen/matplotlib.pyplot.savefig.html)
-    - colors : set of colors through which the lines rotate (default if None)
-    - linestyles : list of linestyles through which the lines rotate (default if None)
-
-    debug=True allows to use the GUI of Python (plt.show()),
-    but it does not show the correct fonts
-
-    for exact behavior see example files
+    Returns the settings of setup (font, font size, figure size, lines) as dict of rcParams
+    without changing the global rcParams. The style is applied with styled.
+    The arguments are the same as for setup.
     """
-
-    if not debug:
-        mpl.use('pgf')      # Does not support plt.show()!!
-
+    rc = {}
     fig_width, fig_height = calculate_figure_size(width, height, unit)
     if fig_width:
         # Update default value for figure size
-        plt.rcParams.update({'figure.figsize': [fig_width, fig_height]})
+        rc['figure.figsize'] = [fig_width, fig_height]
 
     def metadata_to_str(k,v):
         value =str(v).replace("_", "\_")
@@ -92,7 +507,7 @@ def setup(width=None, height=None, unit=None, serif=True, font_size=10, debug=Fa
     if not serif:
         preamble = preamble+"\n"+r"\usepackage{cmbright}"
 
-    tex_fonts = {
+    rc.update({
         # Use pgf to get latex font
         "pgf.texsystem": "pdflatex",
         "pgf.preamble": preamble,
@@ -104,20 +519,95 @@ def setup(width=None, height=None, unit=None, serif=True, font_size=10, debug=Fa
         "legend.fontsize": .7 * font_size,
         "xtick.labelsize": .7 * font_size,
         "ytick.labelsize": .7 * font_size
-        }
-
-    # Update default values
-    plt.rcParams.update(tex_fonts)
+        })
 
     if set_lines or colors or linestyles:
         color = colors or DEFAULT_COLORS
         lines = linestyles or DEFAULT_LINESTYLES
         length = min(len(color), len(lines))
-        plt.rcParams.update({'axes.prop_cycle':
-                            (cycler(color = color[:length])
-                             + cycler(linestyle = lines[:length]))})
+        rc['axes.prop_cycle'] = (cycler.cycler(color = color[:length])
+                                 + cycler.cycler(linestyle = lines[:length]))
+    return rc
+
+
+@contextlib.contextmanager
+def styled(figure_style):
+    """
+    Context manager which applies a style (see style) or the style of a figure
+    (see make_figure(scoped=True)) to rcParams and restores them at the end, e.g.
+
+        with styled(fig):
+            ax.plot(x, y)
 
-def adjust_axes(ax, major_size=5, minor_size=1.5, width=0.5):
+    matplotlib keeps rcParams per process, so only one thread
+    at a time is inside styled (the others wait). Threads can create and save
+    figures with different styles without affecting each other, but they do not
+    draw at the same time.
+    """
+    if isinstance(figure_style, mfigure.Figure):
+        figure_style = figure_style.style
+    with _style_lock, mpl.rc_context(figure_style):
+        yield
+
+
+@contextlib.contextmanager
+def _figure_style(fig):
+    """
+    context in which a figure is drawn and saved: the style of figures of make_figure(scoped=True)
+    (see styled) and the LaTeX processes of latex_manager for the pgf backend (see _latex_pool)
+    """
+    with styled(fig) if getattr(fig, "style", None) is not None else contextlib.nullcontext():
+        with _latex_pool(fig):
+            yield
+
+
+def _compile_format():
+    """
+    compiles the LaTeX preamble of the current rcParams into a format file (see format_file)
+    """
+    header = backend_pgf.LatexManager._build_latex_header()
+    _format_files[header] = format_file(header)
+
+
+def setup(width=None, height=None, unit=None, serif=True, font_size=10, debug=False, set_lines = True, metadata=None, colors = None, linestyles = None,
+          format_cache=False):
+    """
+    The function overwrites the default values for font, font size, figure size
+
+    - width: width of the figure
+    - height: height of the figure
+    - unit: unit of width and height ("in", "pt" or "cm")
+    - serif: with or without serifs
+    - font_size: size of the font
+    - set_lines: sets the style of lines (linestyle and color)
+    - metadata: save metadata for the figure. use a dict
+      (see metadata at
+      https://matplotlib.org/stable/api/_as_gen/matplotlib.pyplot.savefig.html)
+    - colors : set of colors through which the lines rotate (default if None)
+    - linestyles : list of linestyles through which the lines rotate (default if None)
+    - format_cache: compiles the LaTeX preamble once into a format file (see format_file)
+      which is used by the pgf backend to measure texts and by save_figure to compile
+      pdf and png (only without debug)
+
+    debug=True allows to use the GUI of Python (plt.show()),
+    but it does not show the correct fonts
+
+    setup changes the global rcParams, to change them only for one figure
+    see style and styled.
+
+    for exact behavior see example files
+    """
+
+    if not debug:
+        mpl.use('pgf')      # Does not support plt.show()!!
+
+    # Update default values
+    mpl.rcParams.update(style(width, height, unit, serif, font_size, set_lines, metadata, colors, linestyles))
+
+    if format_cache and not debug and _pgf_has(_PGF_DOCUMENT):
+        _compile_format()
+
+def adjust_axes(ax, major_size=5, minor_size=1.5, width=0.5, decimal_comma=False):
     # Edit the major and minor ticks of the x and y axes
     ax.minorticks_on()
     ax.xaxis.set_tick_params(which='major', size=major_size, width=width,
@@ -128,22 +618,562 @@ def adjust_axes(ax, major_size=5, minor_size=1.5, width=0.5):
                             direction='in', right=True)
     ax.yaxis.set_tick_params(which='minor', size=minor_size, width=width,
                             direction='in', right=True)
-    # set the number style
-    ax.ticklabel_format(style='sci', axis='y', scilimits=(-3, 3),
-                        useLocale=True, useMathText=True)
-    ax.ticklabel_format(style='sci', axis='x', scilimits=(-4, 4),
-                        useLocale=True, useMathText=True)
+    set_number_format(ax, decimal_comma)
     # sets the x plot range to the data range
     ax.autoscale(enable=True, axis='x', tight=True)
     # ax.xaxis.labelpad = 5 padding between label and tick label
     ax.yaxis.labelpad = 5 # padding between label and tick label
 
+def set_number_format(ax, decimal_comma=False):
+    """
+    sets the formatters of the tick labels of ax (scientific notation with mathtext,
+    decimal_comma: german number format, see formatters.py)
+    """
+    ax.xaxis.set_major_formatter(formatters.NumberFormatter(decimal_comma))
+    ax.yaxis.set_major_formatter(formatters.NumberFormatter(decimal_comma))
+    ax.ticklabel_format(style='sci', axis='y', scilimits=(-3, 3), useMathText=True)
+    ax.ticklabel_format(style='sci', axis='x', scilimits=(-4, 4), useMathText=True)
+
+def tick_style(major_size=5, minor_size=1.5, width=0.5):
+    """
+    Returns the rcParams which give new axes the ticks of adjust_axes
+    (ticks inside on all four sides with minor ticks) and the x range of the data,
+    so the ticks do not have to be changed for every axes (see make_figure(small_multiples=True))
+    """
+    rc = {"axes.xmargin": 0}
+    for axis, sides in [("xtick", ("top", "bottom")), ("ytick", ("left", "right"))]:
+        rc.update({axis + ".direction": "in", axis + ".minor.visible": True,
+                   axis + ".major.size": major_size, axis + ".minor.size": minor_size,
+                   axis + ".major.width": width, axis + ".minor.width": width})
+        rc.update({axis + "." + side: True for side in sides})
+    return rc
+
+def share_axes(ax):
+    """
+    Gives all axes of a grid (2D array, e.g. from make_figure(small_multiples=True))
+    the tick locators (see formatters.SharedLocator) and formatters of ax[0, 0]
+    and the limits of the data of all axes,
+    only the outer axes keep their tick labels and axis labels.
+    Like sharex="all" and sharey="all", but matplotlib checks all shared axes
+    whenever the limits of one of them are used, so the drawing time of shared
+    axes grows quadratically with their number.
+    Call it again after plotting to update the limits (make_figure does this after plots).
+    """
+    first = ax.flat[0]
+    # the tick positions are computed once for all axes
+    for axis in [first.xaxis, first.yaxis]:
+        for ticks, set_locator in [(axis.major, axis.set_major_locator), (axis.minor, axis.set_minor_locator)]:
+            if not isinstance(ticks.locator, formatters.SharedLocator):
+                set_locator(formatters.SharedLocator(ticks.locator))
+    for a in ax.flat[1:]:
+        a.xaxis.major, a.xaxis.minor = first.xaxis.major, first.xaxis.minor
+        a.yaxis.major, a.yaxis.minor = first.yaxis.major, first.yaxis.minor
+        a.label_outer()
+    data = [a.dataLim for a in ax.flat if np.isfinite(a.dataLim.get_points()).all()]
+    if not data:
+        return
+    x0, x1 = min(d.x0 for d in data), max(d.x1 for d in data)
+    y0, y1 = min(d.y0 for d in data), max(d.y1 for d in data)
+    dx, dy = (x1 - x0) * first.get_xmargin(), (y1 - y0) * first.get_ymargin()
+    xlim = first.xaxis.get_major_locator().nonsingular(x0 - dx, x1 + dx)
+    ylim = first.yaxis.get_major_locator().nonsingular(y0 - dy, y1 + dy)
+    for a in ax.flat:
+        a.set_xlim(xlim, emit=False)
+        a.set_ylim(ylim, emit=False)
+
+def axes_width_pixels(ax, dpi=None):
+    """
+    Returns the width of the axes in pixels of the saved figure
+    (figure width as set by setup/calculate_figure_size times the relative axes width)
+    """
+    fig = ax.get_figure()
+    if dpi is None:
+        dpi = mpl.rcParams["savefig.dpi"]
+        dpi = fig.dpi if dpi == "figure" else dpi
+    return max(1, int(np.ceil(fig.get_size_inches()[0] * ax.get_position().width * dpi)))
+
+def _pixel_columns(x, pixels):
+    """
+    returns the pixel column of every point (x must be sorted)
+    """
+    columns = ((x - x[0]) / ((x[-1] - x[0]) or 1) * pixels).astype(np.int64)
+    np.clip(columns, 0, pixels - 1, out=columns)
+    return columns
+
+def _nan_gaps(y, columns):
+    """
+    returns the indices of the first NaN in every pixel column which contains one,
+    so the gaps of a line stay visible after decimation
+    """
+    nans = np.flatnonzero(np.isnan(y))
+    return nans[np.unique(columns[nans], return_index=True)[1]]
+
+def decimate_minmax(x, y, pixels):
+    """
+    Returns the indices of the first, last, minimal and maximal point
+    (and the first NaN) in every pixel column, so the drawn line looks the same (x must be sorted)
+    """
+    columns = _pixel_columns(x, pixels)
+    starts = np.flatnonzero(np.diff(columns, prepend=-1))
+    ends = np.append(starts[1:], len(x)) - 1
+    counts = ends - starts + 1
+    # fmin/fmax ignore NaN, the gaps are kept by _nan_gaps
+    minima = np.repeat(np.fmin.reduceat(y, starts), counts)
+    maxima = np.repeat(np.fmax.reduceat(y, starts), counts)
+    # first occurrence of the minimum/maximum of each column
+    is_min = np.flatnonzero(y == minima)
+    is_max = np.flatnonzero(y == maxima)
+    argmin = is_min[np.unique(columns[is_min], return_index=True)[1]]
+    argmax = is_max[np.unique(columns[is_max], return_index=True)[1]]
+    return np.unique(np.concatenate([starts, ends, argmin, argmax, _nan_gaps(y, columns)]))
+
+def decimate_lttb(x, y, points):
+    """
+    Returns the indices of points selected with the
+    Largest-Triangle-Three-Buckets algorithm (x must be sorted)
+    """
+    if points >= len(x) or points < 3:
+        return np.arange(len(x))
+    edges = np.linspace(1, len(x) - 1, points - 1).astype(np.int64)
+    # average of every bucket, used as third point of the triangles
+    sums_x = np.add.reduceat(x[1:-1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:-1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.append(sums_x / counts, x[-1])
+    mean_y = np.append(sums_y / counts, y[-1])
+    indices = np.empty(points, dtype=np.int64)
+    indices[0], indices[-1] = 0, len(x) - 1
+    a = 0
+    for i in range(points - 2):
+        start, stop = edges[i], edges[i + 1]
+        area = np.abs((x[a] - mean_x[i + 1]) * (y[start:stop] - y[a])
+                      - (x[a] - x[start:stop]) * (mean_y[i + 1] - y[a]))
+        a = start + np.argmax(area)
+        indices[i + 1] = a
+    return indices
+
+def decimate(x, y, pixels, method="minmax"):
+    """
+    Reduces a line to the points which are visible with a width of pixels (x must be sorted)
+
+    - method: "minmax" (first, last, minimum and maximum per pixel column)
+      or "lttb" (Largest-Triangle-Three-Buckets with 2 points per pixel)
+
+    NaN values (gaps of the line) are kept, at least one per pixel column.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(x) <= 4 * pixels:
+        return x, y
+    if method == "minmax":
+        indices = decimate_minmax(x, y, pixels)
+    elif method == "lttb":
+        nan = np.isnan(y)
+        if nan.any() and not nan.all():
+            # the triangles are computed with the gaps filled by linear interpolation,
+            # the first NaN of every pixel column is added again
+            filled = y.astype(float)
+            filled[nan] = np.interp(np.flatnonzero(nan), np.flatnonzero(~nan), y[~nan])
+            indices = np.union1d(decimate_lttb(x, filled, 2 * pixels), _nan_gaps(y, _pixel_columns(x, pixels)))
+        else:
+            indices = decimate_lttb(x, y, 2 * pixels)
+    else:
+        raise ValueError("ERROR: method must be 'minmax' or 'lttb'")
+    return x[indices], y[indices]
+
+def plot_decimated(ax, x, y, *args, method="minmax", dpi=None, redecimate=False, **kwargs):
+    """
+    The function plots a line with many points (like ax.plot(x, y, *args, **kwargs))
+    but only draws the points that are visible in the saved figure (see decimate)
+
+    - ax: axes (e.g. from make_figure)
+    - x: x values (must be sorted)
+    - y: y values
+    - method: "minmax" or "lttb" (see decimate)
+    - dpi: resolution of the saved figure (default savefig.dpi)
+    - redecimate: decimates the line again from all points if the x limits change
+      (e.g. ax.set_xlim to zoom in)
+
+    Returns the Line2D
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    pixels = axes_width_pixels(ax, dpi)
+    line, = ax.plot(*decimate(x, y, pixels, method), *args, **kwargs)
+
+    if redecimate:
+        def on_xlim_changed(a):
+            xmin, xmax = sorted(a.get_xlim())
+            # keep one point outside of the limits on both sides
+            start = max(np.searchsorted(x, xmin) - 1, 0)
+            stop = min(np.searchsorted(x, xmax, side="right") + 1, len(x))
+            line.set_data(*decimate(x[start:stop], y[start:stop], axes_width_pixels(a, dpi), method))
+        ax.callbacks.connect("xlim_changed", on_xlim_changed)
+    return line
+
+def plot_series(ax, x, ys, colors=None, linestyles=None, **kwargs):
+    """
+    Plots many lines with the same x values as one LineCollection, which is much faster
+    to create and draw than one plot call per line (e.g. for small multiples)
+
+    - x: x values (shape [n])
+    - ys: y values of the lines (shape [lines, n])
+    - colors/linestyles: one entry per line (default: the prop_cycle of setup)
+    - all other keyword arguments are passed to LineCollection (e.g. linewidth, alpha)
+
+    Returns the LineCollection.
+    """
+    ys = np.atleast_2d(ys)
+    segments = np.stack(np.broadcast_arrays(np.asarray(x), ys), axis=-1)
+    if colors is None or linestyles is None:
+        cycle = mpl.rcParams["axes.prop_cycle"].by_key()
+        cycle_colors = cycle.get("color", ["k"])
+        cycle_styles = cycle.get("linestyle", ["-"])
+        colors = colors or [cycle_colors[i % len(cycle_colors)] for i in range(len(ys))]
+        linestyles = linestyles or [cycle_styles[i % len(cycle_styles)] for i in range(len(ys))]
+    lines = mcollections.LineCollection(segments, colors=colors, linestyles=linestyles, **kwargs)
+    ax.add_collection(lines)
+    if not isinstance(ax.xaxis.get_major_locator(), formatters.SharedLocator):
+        # the limits of axes of share_axes are set by share_axes
+        ax.autoscale_view()
+    return lines
+
+def keep_vector(artist):
+    """
+    Excludes an artist from rasterize_heavy_artists (it is always saved as vector graphic)
+    Returns the artist
+    """
+    _vector_artists.add(artist)
+    return artist
+
+def count_elements(artist):
+    """
+    Returns the number of points or path elements an artist writes to a vector file
+    """
+    if isinstance(artist, mlines.Line2D):
+        return len(artist.get_xydata())
+    if isinstance(artist, mcollections.Collection):
+        offsets = len(artist.get_offsets())
+        array = artist.get_array()
+        paths = sum(len(path.vertices) for path in artist.get_paths())
+        return max(offsets, paths, 0 if array is None else array.size)
+    if isinstance(artist, mpatches.Patch):
+        return len(artist.get_path().vertices)
+    return 0
+
+def rasterize_heavy_artists(fig, max_elements=10000, max_bytes=None):
+    """
+    Rasterizes lines, collections (scatter, pcolormesh, ...) and patches with more than
+    max_elements elements or an estimated size of more than max_bytes in vector output.
+    Texts, ticks, legends and images (which are raster graphics anyway) are not changed.
+    Artists passed to keep_vector or already rasterized artists are skipped.
+    The resolution of rasterized artists is the dpi of savefig.
+
+    Returns the list of rasterized artists
+    """
+    rasterized = []
+    for ax in fig.axes:
+        for artist in ax.get_children():
+            if (not isinstance(artist, (mlines.Line2D, mcollections.Collection, mpatches.Patch))
+                    or isinstance(artist, mimage.AxesImage)
+                    or artist is ax.patch or artist in _vector_artists or artist.get_rasterized()):
+                continue
+            elements = count_elements(artist)
+            if elements > max_elements or (max_bytes and elements * BYTES_PER_ELEMENT > max_bytes):
+                artist.set_rasterized(True)
+                rasterized.append(artist)
+    return rasterized
+
+def _renderer(fig):
+    """
+    returns the renderer which is used to save the figure
+    """
+    if hasattr(fig.canvas, "get_renderer"):
+        return fig.canvas.get_renderer()
+    return fig._get_renderer()
+
+def _union(bboxes):
+    """
+    returns the union of bboxes as (x0, y0, x1, y1)
+    """
+    bboxes = [b for b in bboxes if b is not None and b.width and b.height]
+    return (min(b.x0 for b in bboxes), min(b.y0 for b in bboxes),
+            max(b.x1 for b in bboxes), max(b.y1 for b in bboxes))
+
+def _cell_decorations(fig, axes, renderer):
+    """
+    returns (left, bottom, right, top) in pixels by which the tick labels, axis labels
+    and colorbars of axes stick out of the union of their axes
+    """
+    # get_tightbbox applies axes locators (e.g. of colorbars), so it has to be called first
+    tx0, ty0, tx1, ty1 = _union([a.get_tightbbox(renderer) for a in axes])
+    x0, y0, x1, y1 = _union([a.get_window_extent(renderer) for a in axes])
+    return x0 - tx0, y0 - ty0, tx1 - x1, ty1 - y1
+
+def layout(fig, pad=3):
+    """
+    Places the axes of a figure so that tick labels, axis labels and colorbars
+    (e.g. of contourplot) fit into the figure with a distance of pad (in points),
+    like plt.tight_layout() but with a single LaTeX measurement of all texts and no drawing
+    (the decorations are measured again until the positions are stable, at most LAYOUT_PASSES times).
+
+    - subplots (from make_figure with num_subplots_x/num_subplots_y): the margins and the
+      spacing between the subplots are set with fig.subplots_adjust
+    - single axes (make_figure without default_axes): all axes (including colorbars)
+      are moved and scaled together
+    """
+    with _latex_pool(fig):
+        prefetch_text_metrics(fig)
+        renderer = _renderer(fig)
+        pad = pad * fig.dpi / 72
+        # titles and offset texts (e.g. x10^5) are placed relative to the axes and the tick labels,
+        # so they move when the axes are resized: measure again until the layout is stable
+        # (the texts are measured with LaTeX only once, see text_extents)
+        previous = None
+        for _ in range(LAYOUT_PASSES):
+            current = _layout_pass(fig, renderer, pad)
+            if current is None or (previous is not None and np.allclose(current, previous, atol=0.5)):
+                break
+            previous = current
+
+def _layout_pass(fig, renderer, pad):
+    """
+    places the axes once with the decorations measured at their current positions (see layout)
+    and returns the positions of all axes in pixels, None if the decorations do not fit into
+    the figure (the axes are not changed then, like with plt.tight_layout())
+    """
+    width, height = fig.get_size_inches() * fig.dpi
+    specs = [a.get_subplotspec() for a in fig.axes]
+
+    if fig.axes and all(specs):
+        # grid of subplots: measure the decorations of every cell of the outer gridspec
+        cells = {}
+        for a, spec in zip(fig.axes, specs):
+            top = spec.get_topmost_subplotspec()
+            cells.setdefault((top.rowspan.start, top.rowspan.stop - 1,
+                              top.colspan.start, top.colspan.stop - 1), []).append(a)
+        gridspec = specs[0].get_topmost_subplotspec().get_gridspec()
+        rows, cols = gridspec.get_geometry()
+        left, bottom, right, top = [pad] * 4
+        # decorations on both sides of the spaces between the columns and rows
+        gap_left, gap_right = [0] * (cols - 1), [0] * (cols - 1)
+        gap_below, gap_above = [0] * (rows - 1), [0] * (rows - 1)
+        for (row0, row1, col0, col1), axes in cells.items():
+            dl, db, dr, dt = _cell_decorations(fig, axes, renderer)
+            if col0 == 0:
+                left = max(left, dl + pad)
+            else:
+                gap_right[col0 - 1] = max(gap_right[col0 - 1], dl)
+            if col1 == cols - 1:
+                right = max(right, dr + pad)
+            else:
+                gap_left[col1] = max(gap_left[col1], dr)
+            if row1 == rows - 1:
+                bottom = max(bottom, db + pad)
+            else:
+                gap_above[row1] = max(gap_above[row1], db)
+            if row0 == 0:
+                top = max(top, dt + pad)
+            else:
+                gap_below[row0 - 1] = max(gap_below[row0 - 1], dt)
+        # subplots_adjust sets the space between subplots relative to the average axes size
+        gap_x = max(map(sum, zip(gap_left, gap_right)), default=0) + pad
+        gap_y = max(map(sum, zip(gap_below, gap_above)), default=0) + pad
+        axes_width = (width - left - right - (cols - 1) * gap_x) / cols
+        axes_height = (height - bottom - top - (rows - 1) * gap_y) / rows
+        if axes_width <= 0 or axes_height <= 0:
+            return None
+        fig.subplots_adjust(left=left / width, right=1 - right / width,
+                            bottom=bottom / height, top=1 - top / height,
+                            wspace=gap_x / axes_width if cols > 1 else None,
+                            hspace=gap_y / axes_height if rows > 1 else None)
+    elif fig.axes:
+        # free axes: move and scale all axes together
+        dl, db, dr, dt = _cell_decorations(fig, fig.axes, renderer)
+        x0, y0, x1, y1 = _union([a.get_window_extent(renderer) for a in fig.axes])
+        scale_x = (width - 2 * pad - dl - dr) / (x1 - x0)
+        scale_y = (height - 2 * pad - db - dt) / (y1 - y0)
+        if scale_x <= 0 or scale_y <= 0:
+            return None
+        for a in fig.axes:
+            position = a.get_position()
+            a.set_position([(pad + dl + (position.x0 * width - x0) * scale_x) / width,
+                            (pad + db + (position.y0 * height - y0) * scale_y) / height,
+                            position.width * scale_x, position.height * scale_y])
+    return [list(a.get_position().bounds * np.array([width, height, width, height])) for a in fig.axes]
+
+def output_paths(output_file):
+    """
+    returns the list of paths of output_file (see save_figure):
+    a path or a list of paths and formats, formats without a path
+    (e.g. "svg") are saved next to the first path with the extension of the format
+    """
+    files = [output_file] if isinstance(output_file, (str, os.PathLike)) else list(output_file)
+    paths = [os.fspath(f) for f in files if os.path.splitext(f)[1]]
+    if not paths:
+        raise ValueError("ERROR: output_file must contain at least one path with a file extension")
+    root = os.path.splitext(paths[0])[0]
+    return [os.fspath(f) if os.path.splitext(f)[1] else root + "." + f.lstrip(".") for f in files]
+
+def _split_hypersetup(preamble):
+    """
+    returns the preamble without its \\hypersetup{...} commands (e.g. the pdf metadata of setup)
+    and the list of these commands
+    """
+    commands = []
+    parts = []
+    position = 0
+    for match in re.finditer(r"\\hypersetup\{", preamble):
+        if match.start() < position:
+            continue  # inside of a previous command
+        depth, end = 1, match.end()
+        while depth and end < len(preamble):
+            depth += {"{": 1, "}": -1}.get(preamble[end], 0)
+            end += 1
+        parts.append(preamble[position:match.start()])
+        commands.append(preamble[match.start():end])
+        position = end
+    parts.append(preamble[position:])
+    return "".join(parts), commands
+
+def _pgf_document(fig):
+    """
+    returns the preamble and the rest of the LaTeX document which compiles figure.pgf
+    to a pdf (the same document as savefig(format="pdf") of the pgf backend).
+    The preamble is the same for all figures (see format_file), the size of the
+    figure and the pdf metadata are set after it.
+    """
+    w, h = fig.get_size_inches()
+    pdfinfo = ','.join(backend_pgf._metadata_to_str(k, v)
+                       for k, v in backend_pgf._create_pdf_info_dict('pgf', {}).items())
+    preamble, hypersetup = _split_hypersetup(backend_pgf._get_preamble())
+    return "\n".join([
+        backend_pgf._DOCUMENTCLASS,
+        r"\usepackage{hyperref}",
+        r"\usepackage{geometry}",
+        r"\usepackage{pgf}",
+        preamble]), "\n".join(
+        [r"\hypersetup{pdfinfo={%s}}" % pdfinfo] + hypersetup + [
+        r"\geometry{papersize={%fin,%fin}, margin=0in}" % (w, h),
+        r"\begin{document}",
+        r"\centering",
+        r"\input{figure.pgf}",
+        r"\end{document}"])
+
+def _copy_pgf(tmpdir, path):
+    """
+    copies figure.pgf of tmpdir to path together with its raster images: the pgf backend
+    saves images next to the pgf file as figure-img0.png, ..., they are copied to
+    <name>-img0.png, ... next to path and the references in the pgf code are renamed
+    (like savefig(path) of the pgf backend)
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    with open(os.path.join(tmpdir, "figure.pgf"), encoding="utf-8") as f:
+        code = f.read()
+    images = sorted(f for f in os.listdir(tmpdir) if re.fullmatch(r"figure-img\d+\.png", f))
+    for image in images:
+        shutil.copyfile(os.path.join(tmpdir, image),
+                        os.path.join(os.path.dirname(path), stem + image[len("figure"):]))
+    if images:
+        code = re.sub(r"\]\{figure-img(\d+)\.png\}", lambda m: "]{%s-img%s.png}" % (stem, m.group(1)), code)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(code)
+
+def _compile_pgf(tmpdir, texsystem, pdf_paths, png_paths, dpi, fmt=None):
+    """
+    compiles figure.tex in tmpdir once and copies the pdf to pdf_paths and its
+    conversion to png to png_paths (runs in a thread of save_figure)
+
+    - fmt: precompiled format of the preamble (see format_file), then figure.tex
+      contains only the document after the preamble
+    """
+    global _latex_runs
+    _latex_runs += 1
+    subprocess.run([texsystem, "-interaction=nonstopmode", "-halt-on-error", "-no-shell-escape"]
+                   + (["&" + os.path.splitext(fmt)[0]] if fmt else []) + ["figure.tex"],
+                   cwd=tmpdir, check=True, stdin=subprocess.DEVNULL,
+                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    pdf = os.path.join(tmpdir, "figure.pdf")
+    for path in pdf_paths:
+        shutil.copyfile(pdf, path)
+    if png_paths:
+        png = os.path.join(tmpdir, "figure.png")
+        backend_pgf.make_pdf_to_png_converter()(pdf, png, dpi=dpi)
+        for path in png_paths:
+            shutil.copyfile(png, path)
+
+@profiling.profiled("save_figure", "output_file")
+def save_figure(fig, output_file, dpi=None):
+    """
+    Saves a figure in one or more formats with a single measurement of its texts.
+
+    - output_file: path or list of paths and formats, e.g. ["plot.pdf", "svg", "png"]
+      (formats without a path are saved next to the first path, see output_paths)
+    - dpi: resolution of the raster formats and rasterized artists (default savefig.dpi)
+
+    With the pgf backend the figure is drawn once as pgf code, which is saved as pgf
+    and compiled once with LaTeX for pdf and png (converted from the pdf).
+    LaTeX runs in a background thread while the other formats (e.g. svg) are drawn.
+    Figures of make_figure(scoped=True) are saved with their style (see styled).
+    Returns the list of saved paths.
+    With profiling the number of artists and the bytes written are counted (see profiling.py).
+    """
+    paths = output_paths(output_file)
+    formats = [os.path.splitext(p)[1][1:].lower() for p in paths]
+    latex = isinstance(fig.canvas, backend_pgf.FigureCanvasPgf) and \
+        any(f in ("pgf", "pdf", "png") for f in formats) and _pgf_has(_PGF_DOCUMENT)
+    with contextlib.ExitStack() as stack:
+        executor = stack.enter_context(futures.ThreadPoolExecutor(max_workers=1))
+        jobs = []
+        with _figure_style(fig):
+            if dpi is None or dpi == "figure":
+                dpi = fig.dpi if mpl.rcParams["savefig.dpi"] == "figure" else mpl.rcParams["savefig.dpi"]
+            with profiling.phase("prefetch_text_metrics"):
+                prefetch_text_metrics(fig)
+            if latex:
+                tmpdir = stack.enter_context(tempfile.TemporaryDirectory())
+                with profiling.phase("savefig", format="pgf"):
+                    fig.savefig(os.path.join(tmpdir, "figure.pgf"), format="pgf", dpi=dpi)
+                for path, f in zip(paths, formats):
+                    if f == "pgf":
+                        _copy_pgf(tmpdir, path)
+                pdf_paths = [p for p, f in zip(paths, formats) if f == "pdf"]
+                png_paths = [p for p, f in zip(paths, formats) if f == "png"]
+                if pdf_paths or png_paths:
+                    preamble, document = _pgf_document(fig)
+                    fmt = None
+                    if backend_pgf.LatexManager._build_latex_header() in _format_files:
+                        # format_cache: the preamble of the document is loaded from a format file
+                        with profiling.phase("format_cache"):
+                            fmt = format_file(preamble)
+                        if " " in fmt:
+                            fmt = None  # TeX can not load formats from paths with spaces
+                    with open(os.path.join(tmpdir, "figure.tex"), "w", encoding="utf-8") as tex:
+                        tex.write(document if fmt else preamble + "\n" + document)
+                    jobs.append(executor.submit(_compile_pgf, tmpdir, mpl.rcParams["pgf.texsystem"],
+                                                pdf_paths, png_paths, dpi, fmt))
+            for path, f in zip(paths, formats):
+                if not (latex and f in ("pgf", "pdf", "png")):
+                    with profiling.phase("savefig", format=f):
+                        fig.savefig(path, format=f, dpi=dpi)
+        # LaTeX runs without blocking other threads in styled
+        with profiling.phase("latex"):
+            for job in jobs:
+                job.result()
+    if profiling.enabled():
+        profiling.count(artists=sum(1 for a in fig.findobj() if a.get_visible()),
+                        bytes_written=sum(os.path.getsize(p) for p in paths))
+    return paths
+
+@profiling.profiled("make_figure", "output_file")
 def make_figure(width=None, height=None, unit=None, serif=True,
                 de=False, plots=None, output_file=None,
                 default_axes=False, other_axes=None, metadata=None,
                 font_size=10, num_subplots_x=1, num_subplots_y=1, 
                 width_ratios=None, height_ratios=None, sharex=False, sharey=False,
-                tight_layout=False, debug=False, set_lines=True, colors = None, linestyles = None):
+                tight_layout=False, debug=False, set_lines=True, colors = None, linestyles = None,
+                format_cache=False, cache=None, rasterize=None, dpi=None, pyplot=True, reuse=False,
+                scoped=False, small_multiples=False):
     """
     The function overwrites the default values for font, font size, figure size
     and creates a figure with modified axes and ticks.
@@ -155,7 +1185,8 @@ def make_figure(width=None, height=None, unit=None, serif=True,
     - serif: with or without serifs
     - de: german number format activated
     - plots: function that takes fig and ax and performs the plots
-    - output_file: Path and Name of the File that saves the figure
+    - output_file: Path and Name of the File that saves the figure,
+      or a list of paths and formats, e.g. ["plot.pdf", "svg", "png"] (see save_figure)
     - default_axes: if you whish to use the default axes
       (always True, when using subplots)
     - other_axes: if you whish to use other axes
@@ -175,63 +1206,556 @@ def make_figure(width=None, height=None, unit=None, serif=True,
     - sharex: only relevant if num_subplots_y>1; if True: share x axis (default if False)
       one can remove whitespace with plt.subplots_adjust(hspace=.0)
     - sharey: only relevant if num_subplots_x>1; if True: share y axis (default if False)
-    - tight_layout: plt.tight_layout() (only useful with subplots)
+    - tight_layout: places the axes so that all labels fit into the figure (see layout),
+      if plots is given, after plotting
     - set_lines: sets the style of lines (linestyle and color)
     - colors : list of colors through which the lines rotate (default if None)
     - linestyles : list of linestyles through which the lines rotate (default if None)
+    - format_cache: precompile the LaTeX preamble (see setup)
+    - cache: outputcache.OutputCache; if plots and output_file are given and a figure
+      with the same arguments, plots code and data was saved before, the cached file
+      is copied to output_file and (None, None) is returned without rendering
+      (figures with arguments which can not be hashed, see outputcache.figure_key, are not cached)
+    - rasterize: if output_file is a vector format (pdf, pgf, svg, ...), artists with
+      more than rasterize elements are rasterized (see rasterize_heavy_artists),
+      the rasterized artists are stored in fig.rasterized_artists (default None: off)
+    - dpi: resolution of output_file and of rasterized artists (default savefig.dpi)
+    - pyplot: if False, the figure is created without pyplot, so it is not kept
+      in memory by pyplot until plt.close (the plots function must not use plt.gca and similar)
+      (see figure_context and release_figure)
+    - reuse: only with pyplot=False; reuses an unused figure of the same size
+      (see release_figure) instead of creating a new one
+    - scoped: the settings of setup are not applied to the global rcParams,
+      but stored in fig.style and applied only while the figure is created,
+      plotted and saved (see style and styled), so several threads can create
+      figures with different settings at once (use it with pyplot=False)
+    - small_multiples: grid of num_subplots_y x num_subplots_x axes (e.g. 20 x 20)
+      which is saved about 20-40 % faster than the default grid (created in about the same time)
+      and whose axes share their x and y axes (locators, formatters and limits, see share_axes),
+      the ticks are set once with rcParams (see tick_style) and only the outer axes
+      get tick labels; ax is always a 2D array (ax[row, column]),
+      many lines per axes can be drawn at once with plot_series
 
     debug=True allows to use the GUI of Python (plt.show()),
     but it does not show the correct fonts
 
+    The number of LaTeX measurements needed until the figure is saved
+    is stored in fig.latex_roundtrips.
+    The time of every step (setup, subplots, adjust_axes, plots, layout, save_figure, ...)
+    can be measured with profiling.py.
+
     for exact behavior see example files
     """
 
-    setup(width, height, unit, serif, font_size, debug, set_lines, metadata, colors, linestyles)
+    if cache is not None and plots and output_file:
+        arguments = dict(locals())
+        for name in ["cache", "pyplot", "reuse", "scoped"]:
+            del arguments[name]
+        with profiling.phase("cache") as p:
+            key = outputcache.figure_key(**arguments)
+            if key is None:
+                # arguments which can not be hashed by content: the figure is always rendered
+                cache.misses += 1
+                hit = False
+            else:
+                hit = cache.fetch(key, output_paths(output_file))
+            p.add(cache_hits=int(hit))
+        if hit:
+            return None, None
 
+    with profiling.phase("setup"):
+        if scoped:
+            figure_style = style(width, height, unit, serif, font_size, set_lines, metadata, colors, linestyles)
+            if not debug:
+                if pyplot:
+                    mpl.use('pgf')
+            context = styled(figure_style)
+        else:
+            setup(width, height, unit, serif, font_size, debug, set_lines, metadata, colors, linestyles, format_cache)
+            context = contextlib.nullcontext()
 
-    # creates figure
-    fig, ax = plt.subplots(num_subplots_y, num_subplots_x, gridspec_kw={"width_ratios": width_ratios, "height_ratios": height_ratios}, sharex=sharex, sharey=sharey)
+    fig = None
+    try:
+        with context, _latex_pool() if not debug else contextlib.nullcontext():
+            if scoped and format_cache and not debug and _pgf_has(_PGF_DOCUMENT):
+                with profiling.phase("format_cache"):
+                    _compile_format()
+            roundtrips = latex_roundtrips()
 
-    # overwrites axes
-    if not default_axes and num_subplots_x==1 and num_subplots_y==1:
-        fig.clf()
-        # arbitrarily selected ratio between offset and wide
-        xoff = 0.207-0.014*fig.get_size_inches()[0]
-        yoff = xoff
-        default = [xoff, yoff, 1-1.5*xoff, 1-1.5*yoff]  # x, y, width, height
-        ax = plt.axes(other_axes if other_axes else default)
+            # creates figure
+            with profiling.phase("subplots"):
+                fig = plt.figure() if pyplot else _new_figure(debug, reuse)
+                if scoped:
+                    fig.style = figure_style
+                if small_multiples:
+                    # the ticks are set by rcParams when the axes are created, all axes share
+                    # their locators, formatters and limits, only the outer axes get tick labels
+                    with mpl.rc_context(tick_style()):
+                        ax = fig.subplots(num_subplots_y, num_subplots_x, gridspec_kw={"width_ratios": width_ratios, "height_ratios": height_ratios}, squeeze=False)
+                    share_axes(ax)
+                else:
+                    ax = fig.subplots(num_subplots_y, num_subplots_x, gridspec_kw={"width_ratios": width_ratios, "height_ratios": height_ratios}, sharex=sharex, sharey=sharey)
 
-    # sets german number format
-    if de:
-        locale.setlocale(locale.LC_ALL, "de_DE.utf8" if platform.system() == "Linux" else "deu_deu")
+                # overwrites axes
+                if not default_axes and not small_multiples and num_subplots_x==1 and num_subplots_y==1:
+                    fig.clf()
+                    # arbitrarily selected ratio between offset and wide
+                    xoff = 0.207-0.014*fig.get_size_inches()[0]
+                    yoff = xoff
+                    default = [xoff, yoff, 1-1.5*xoff, 1-1.5*yoff]  # x, y, width, height
+                    ax = fig.add_axes(other_axes if other_axes else default)
 
-    if num_subplots_x==1 and num_subplots_y==1:
-        ax=np.array([ax])
+            with profiling.phase("adjust_axes"):
+                if small_multiples:
+                    # sets german number format (the formatters are shared by all axes)
+                    set_number_format(ax.flat[0], decimal_comma=de)
+                    for a in ax[:, 0]:
+                        a.yaxis.labelpad = 5
+                else:
+                    # ax is a single axes, a row or a grid of axes
+                    for a in np.ravel(ax):
+                        # sets german number format
+                        adjust_axes(a, decimal_comma=de)
+            if tight_layout and not plots:
+                with profiling.phase("layout"):
+                    layout(fig)
 
-    for a in ax:
-        adjust_axes(a)
+            # performs and saves the plots
+            fig.rasterized_artists = []
+            if plots:
+                with profiling.phase("plots"):
+                    plots(fig, ax)
+                    if small_multiples:
+                        share_axes(ax)
+                if tight_layout:
+                    with profiling.phase("layout"):
+                        layout(fig)
+                if output_file:
+                    paths = output_paths(output_file)
+                    if rasterize is not None and any(os.path.splitext(p)[1][1:] in VECTOR_FORMATS for p in paths):
+                        with profiling.phase("rasterize"):
+                            fig.rasterized_artists = rasterize_heavy_artists(fig, rasterize)
+                    save_figure(fig, paths, dpi)
+                    if cache is not None and key is not None:
+                        cache.store(key, paths)
+            # number of LaTeX measurements needed by this figure up to now
+            fig.latex_roundtrips = latex_roundtrips() - roundtrips
+    except Exception:
+        # figures without pyplot are freed (and returned to the pool with reuse),
+        # e.g. if plots raises in a worker of make_figures
+        if fig is not None and not pyplot:
+            release_figure(fig, reuse)
+        raise
+    return fig, ax
 
-    if num_subplots_x==1 and num_subplots_y==1:
-        ax=ax[0]
-    elif tight_layout:
-        plt.tight_layout()
 
-    # performs and saves the plots
-    if plots:
-        plots(fig, ax)
-        if output_file:
-            file_extension = os.path.splitext(output_file)[1]
-            fig.savefig(output_file, format=file_extension[1:])
-    return fig, ax
+def _pool_key(fig):
+    """
+    key of the figure pool: figure size, dpi and canvas class
+    """
+    return tuple(fig.get_size_inches()), fig.dpi, type(fig.canvas)
+
+
+def _new_figure(debug, reuse):
+    """
+    creates a figure without pyplot (or takes one from the figure pool if reuse is True)
+    with the canvas of the pgf backend (Agg in debug mode)
+    """
+    canvas_class = backend_agg.FigureCanvasAgg if debug else backend_pgf.FigureCanvasPgf
+    key = (tuple(mpl.rcParams["figure.figsize"]), mpl.rcParams["figure.dpi"], canvas_class)
+    if reuse and _figure_pool.get(key):
+        _figure_pool[key] = _figure_pool.pop(key)  # most recently used
+        fig = _figure_pool[key].pop()
+        # reset the subplot parameters which may have been changed by layout
+        fig.subplots_adjust(**{k: mpl.rcParams["figure.subplot." + k]
+                               for k in ["left", "right", "bottom", "top", "wspace", "hspace"]})
+        return fig
+    fig = mfigure.Figure()
+    canvas_class(fig)
+    return fig
+
+
+def release_figure(fig, reuse=False):
+    """
+    Frees a figure: figures of pyplot are closed, all other figures are cleared
+    (all artists are removed).
+
+    - reuse: keeps the cleared figure (if it was created without pyplot) for the next
+      make_figure(pyplot=False, reuse=True) with the same size
+      (at most FIGURE_POOL_SIZE figures per size and FIGURE_POOL_TOTAL figures of all sizes,
+      the figures of the least recently used sizes are dropped first)
+    """
+    if fig is None:
+        return
+    if fig.canvas.manager is not None:
+        plt.close(fig)
+        return
+    fig.clear()
+    for attribute in ["rasterized_artists", "latex_roundtrips", "style"]:
+        fig.__dict__.pop(attribute, None)
+    if reuse:
+        key = _pool_key(fig)
+        pool = _figure_pool[key] = _figure_pool.pop(key, [])  # most recently used
+        if len(pool) < FIGURE_POOL_SIZE:
+            pool.append(fig)
+        while sum(map(len, _figure_pool.values())) > FIGURE_POOL_TOTAL:
+            oldest = next(iter(_figure_pool))
+            # the figures are already cleared, so dropping them frees them
+            if _figure_pool[oldest]:
+                _figure_pool[oldest].pop(0)
+            if not _figure_pool[oldest]:
+                del _figure_pool[oldest]
+
+
+@contextlib.contextmanager
+def figure_context(reuse=True, **kwargs):
+    """
+    Context manager which creates a figure without pyplot with make_figure
+    and frees it at the end (see release_figure), e.g.
+
+        with figure_context(width=8, unit="cm", plots=plots, output_file="a.pdf") as (fig, ax):
+            ...
+
+    - reuse: takes the figure from and returns it to the pool of unused figures
+    - all other keyword arguments are passed to make_figure
+    """
+    fig, ax = make_figure(pyplot=False, reuse=reuse, **kwargs)
+    try:
+        yield fig, ax
+    finally:
+        release_figure(fig, reuse)
+
+
+class SharedArray:
+    """
+    Small picklable handle of an array in shared memory or in a memory mapped file
+    (see share_array). Worker processes get a view of the array with array()
+    without copying it.
+
+    - name: name of the shared memory (None for a memory mapped file)
+    - shape, dtype: shape and dtype of the array
+    - filename, offset, order: file, position and order of a memory mapped array
+    """
+
+    def __init__(self, name, shape, dtype, filename=None, offset=0, order="C"):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.filename = filename
+        self.offset = offset
+        self.order = order
+
+    def array(self):
+        """
+        returns a view of the shared array (read only for memory mapped files)
+        """
+        if self.filename is not None:
+            return np.memmap(self.filename, dtype=self.dtype, mode="r", offset=self.offset,
+                             shape=self.shape, order=self.order)
+        if self.name in _shared_segments:
+            segment = _shared_segments[self.name][0]
+        elif self.name in _attached_segments:
+            segment = _attached_segments[self.name]
+        else:
+            if sys.version_info >= (3, 13):
+                segment = shared_memory.SharedMemory(self.name, track=False)
+            else:
+                # child processes share the resource tracker of the creating process
+                segment = shared_memory.SharedMemory(self.name)
+            _attached_segments[self.name] = segment
+        return np.ndarray(self.shape, self.dtype, buffer=segment.buf)
+
+    def retain(self):
+        """
+        adds a reference to the shared memory (in the process which created it)
+        """
+        if self.name in _shared_segments:
+            _shared_segments[self.name][1] += 1
+        return self
+
+    def release(self):
+        """
+        removes a reference to the shared memory (in the process which created it),
+        the shared memory is freed when no reference is left
+        (views of the array must not be used afterwards)
+        """
+        entry = _shared_segments.get(self.name)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del _shared_segments[self.name]
+            segment = entry[0]
+            segment.unlink()
+            try:
+                segment.close()
+            except BufferError:
+                pass  # a view of the array is still used, it is closed with the view
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def __repr__(self):
+        return "SharedArray(%r, shape=%r, dtype=%r)" % (self.name or self.filename, self.shape, self.dtype)
+
+
+def share_array(array):
+    """
+    Makes an array available to other processes without pickling it and returns a
+    SharedArray handle (a few bytes when pickled), e.g.
+
+        with share_array(z) as z_shared:
+            make_figures([dict(plots=functools.partial(plot_z, z=z_shared), ...), ...])
+
+    and in the worker process z = z_shared.array() (a view without copy).
+    Memory mapped files (np.memmap, e.g. np.load(..., mmap_mode="r")) are opened again
+    by the workers, all other arrays are copied once into shared memory,
+    which is freed when the last reference is released (see SharedArray.release).
+    make_figures does this automatically for large arrays (see SHARED_ARRAY_MIN_BYTES).
+    """
+    if (isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and array.filename
+            and (array.flags.c_contiguous or array.flags.f_contiguous)):
+        return SharedArray(None, array.shape, array.dtype.str, array.filename, array.offset,
+                           "C" if array.flags.c_contiguous else "F")
+    array = np.asarray(array)
+    if array.dtype.hasobject:
+        raise ValueError("ERROR: arrays of python objects can not be shared")
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+    _shared_segments[segment.name] = [segment, 1]
+    return SharedArray(segment.name, array.shape, array.dtype.str)
+
+
+def _share_arrays(value, shared, used):
+    """
+    replaces large arrays in value (also in lists, tuples, dicts and arguments of
+    functools.partial) by SharedArray handles, the same array is shared only once
+
+    - shared: handles by id of the array
+    - used: list to which every used handle is appended (with a reference)
+    """
+    if isinstance(value, functools.partial):
+        return functools.partial(value.func, *_share_arrays(value.args, shared, used),
+                                 **_share_arrays(value.keywords, shared, used))
+    if isinstance(value, (list, tuple)):
+        return type(value)(_share_arrays(v, shared, used) for v in value)
+    if isinstance(value, dict):
+        return {k: _share_arrays(v, shared, used) for k, v in value.items()}
+    # subclasses (e.g. masked arrays) are pickled
+    if type(value) in (np.ndarray, np.memmap) and value.nbytes >= SHARED_ARRAY_MIN_BYTES \
+            and not value.dtype.hasobject:
+        if id(value) in shared:
+            handle = shared[id(value)][0].retain()
+        else:
+            handle = share_array(value)
+            # the array is kept, so its id is not reused by another array
+            shared[id(value)] = (handle, value)
+        used.append(handle)
+        return handle
+    return value
+
+
+def _resolve_arrays(value):
+    """
+    replaces SharedArray handles in value by views of the arrays (see _share_arrays)
+    """
+    if isinstance(value, SharedArray):
+        return value.array()
+    if isinstance(value, functools.partial):
+        return functools.partial(value.func, *_resolve_arrays(value.args), **_resolve_arrays(value.keywords))
+    if isinstance(value, (list, tuple)):
+        return type(value)(_resolve_arrays(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _resolve_arrays(v) for k, v in value.items()}
+    return value
+
+
+def _detach_arrays():
+    """
+    closes the shared memory of other processes which is no longer used by this process
+    """
+    if not _attached_segments:
+        return
+    # the artists of released figures reference each other
+    gc.collect()
+    for name, segment in list(_attached_segments.items()):
+        try:
+            segment.close()
+        except BufferError:
+            continue  # a view of the array is still used
+        del _attached_segments[name]
+
+
+def _init_worker(debug):
+    """
+    runs once in every worker process of make_figures and selects the backend
+    """
+    setup(debug=debug)
+
+
+def _render_spec(spec, profile=False):
+    """
+    renders a single figure spec inside a worker process of make_figures
+    (profile: returns the events of its phases, see profiling.py)
+    """
+    result = {"output_file": spec.get("output_file"), "error": None, "latex_roundtrips": 0, "events": [],
+              "cached": False, "cache_counts": (0, 0)}
+    # the cache is a copy in this process, its hits and misses are counted by make_figures
+    cache = spec.get("cache")
+    counts = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    if profile:
+        profiling.add_hook(result["events"].append)
+    try:
+        fig, ax = make_figure(**dict({"pyplot": False, "reuse": True}, **_resolve_arrays(spec)))
+        if fig is not None:
+            result["latex_roundtrips"] = fig.latex_roundtrips
+        release_figure(fig, reuse=True)
+    except Exception:
+        result["error"] = traceback.format_exc()
+    finally:
+        if profile:
+            profiling.remove_hook(result["events"].append)
+        if cache is not None:
+            result["cache_counts"] = (cache.hits - counts[0], cache.misses - counts[1])
+            result["cached"] = result["cache_counts"][0] > 0
+    _detach_arrays()
+    return result
+
+
+def make_figures(specs, workers=None, debug=False):
+    """
+    The function renders many figures in parallel with a pool of worker processes.
+    Every spec is a dict of keyword arguments for make_figure
+    (e.g. width, height, unit, serif, font_size, num_subplots_x, num_subplots_y,
+    plots, output_file).
+
+    - specs: list of dicts with the arguments of make_figure
+    - workers: number of worker processes (default is the number of cpus)
+    - debug: debug mode of setup for all workers (see setup)
+
+    The plots function of every spec must be defined at module level of an
+    importable module, because it is sent to the worker processes.
+    The workers are started fresh (spawn), so they do not depend on the
+    pyplot state of the calling process.
+    The LaTeX processes of every worker are reused for all its figures
+    (see latex_manager).
+    Arrays from SHARED_ARRAY_MIN_BYTES on in the specs (also in the arguments of
+    functools.partial plots functions) are not pickled, but passed in shared memory
+    (see share_array), an array used by several specs is copied only once.
+    If profiling is enabled (see profiling.py), the phases of the figures in the
+    workers are passed to the hooks of the calling process.
+    Returns a list of dicts in the order of specs with the keys
+    output_file, error (None on success or the traceback as string, also if
+    the spec can not be sent to the workers),
+    latex_roundtrips (number of LaTeX measurements of the figure) and
+    cached (True if the output file was taken from the cache of the spec,
+    the hits and misses are counted in the cache of the calling process).
+    """
+    shared = {}
+    handles = []  # shared arrays of every spec, released when the spec is rendered
+    context = multiprocessing.get_context("spawn")
+    results = []
+    try:
+        with futures.ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(debug,)) as executor:
+            render = functools.partial(_render_spec, profile=profiling.enabled())
+            # every spec is submitted on its own, so a spec which can not be sent
+            # to the workers (e.g. a lambda as plots) only fails its own figure
+            jobs = []
+            for spec in specs:
+                handles.append([])
+                try:
+                    job = _share_arrays(dict(spec, debug=spec.get("debug", debug)), shared, handles[-1])
+                    jobs.append(executor.submit(render, job))
+                except Exception:
+                    jobs.append(traceback.format_exc())
+            for spec, job, used in zip(specs, jobs, handles):
+                try:
+                    result = job if isinstance(job, str) else job.result()
+                except Exception:
+                    # e.g. the spec can not be pickled
+                    result = traceback.format_exc()
+                if isinstance(result, str):
+                    result = {"output_file": spec.get("output_file"), "error": result,
+                              "latex_roundtrips": 0, "events": [], "cached": False, "cache_counts": (0, 0)}
+                hits, misses = result.pop("cache_counts")
+                if spec.get("cache") is not None:
+                    spec["cache"].hits += hits
+                    spec["cache"].misses += misses
+                # the phases of the workers are passed to the hooks of this process
+                for event in result.pop("events"):
+                    profiling.emit(event)
+                results.append(result)
+                while used:
+                    used.pop().release()
+    finally:
+        for used in handles:
+            while used:
+                used.pop().release()
+    return results
+
+
+# removes files (sys.argv[3:]) delay seconds (sys.argv[2]) after the process pid (sys.argv[1]) has exited
+_REMOVE_FILES_SCRIPT = """
+import os, sys, time
+pid, delay, paths = int(sys.argv[1]), float(sys.argv[2]), sys.argv[3:]
+while True:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        break
+    except PermissionError:
+        pass
+    time.sleep(1)
+time.sleep(delay)
+for path in paths:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+"""
+
+
+def remove_when_closed(pid, paths, delay=None):
+    """
+    Removes files delay seconds after the (viewer) process pid has exited.
+    The files are removed by a detached python process, so they are kept after
+    the end of the script which shows them (e.g. a script which ends with show(fig)).
+    On windows the files are left in the temporary folder.
+
+    - delay: seconds the files are kept after the process has exited (default VIEWER_CLEANUP_DELAY),
+      viewers opened with xdg-open or open may read the file after the command has returned
+    """
+    if os.name != "posix":
+        return
+    if delay is None:
+        delay = VIEWER_CLEANUP_DELAY
+    subprocess.Popen([sys.executable, "-c", _REMOVE_FILES_SCRIPT, str(pid), str(delay)] + list(paths),
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
 
 
-def show(fig):
+def show(fig, viewer="evince"):
     """
-    this function saves a figure temporary and opens it with evince.
-    After the file is closed it will be deleted
+    this function saves a figure temporary and opens it with evince (or viewer)
+    without blocking. The file is deleted VIEWER_CLEANUP_DELAY seconds after the
+    viewer is closed, also if the script has ended before (see remove_when_closed).
+    For a fast preview without LaTeX see preview.preview
     """
-    file = "/tmp/figure_show"\
-        + datetime.datetime.now().strftime("%y%m%d_%H%M%S")+".pdf"
-    fig.savefig(file, format="pdf")
-    os.system("evince "+file)
-    os.remove(file)
+    handle, file = tempfile.mkstemp(prefix="figure_show_", suffix=".pdf")
+    os.close(handle)
+    try:
+        with _figure_style(fig):
+            fig.savefig(file, format="pdf")
+        process = subprocess.Popen([viewer, file])
+    except BaseException:
+        # e.g. the viewer is not installed
+        os.remove(file)
+        raise
+    # waits for the viewer, so it does not remain as zombie process while the script runs
+    threading.Thread(target=process.wait, daemon=True).start()
+    remove_when_closed(process.pid, [file])
+    return process
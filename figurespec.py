@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import argparse
+import functools
+from lazyimport import lazy_import
+
+import figure
+
+# heavy modules are imported on first use (see lazyimport.py)
+np = lazy_import("numpy")
+traceback = lazy_import("traceback")
+contourplots = lazy_import("contourplots")
+
+# keys of a figure spec which are not passed to make_figure
+SPEC_KEYS = ["data", "layers", "axes"]
+# keys of a layer which are data references
+DATA_KEYS = ["x", "y", "z"]
+
+# loaded data files by path and options: (modification time, size, array)
+_data_cache = {}
+
+
+def _file_stamp(path):
+    """
+    returns modification time and size of a file (None if it does not exist)
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_data(path, **options):
+    """
+    Loads an array from a .npy file (memory mapped) or a text file (.csv, .txt, .dat, ...)
+    and keeps it until the file is changed, so figures which use the same file read it once.
+
+    - path: path of the file
+    - options: keyword arguments of np.loadtxt (e.g. delimiter, skiprows),
+      csv files use delimiter="," by default
+    """
+    key = (path, json.dumps(options, sort_keys=True))
+    stamp = _file_stamp(path)
+    if stamp is None:
+        raise ValueError("ERROR: data file %s does not exist" % path)
+    if key in _data_cache and _data_cache[key][0] == stamp:
+        return _data_cache[key][1]
+    if path.endswith(".npy"):
+        array = np.load(path, mmap_mode="r", **options)
+    else:
+        if path.endswith(".csv"):
+            options = dict({"delimiter": ","}, **options)
+        array = np.loadtxt(path, **options)
+    _data_cache[key] = (stamp, array)
+    return array
+
+
+def _reference_name(reference):
+    """
+    returns the data name of a reference "name" or "name:column" (None for inline values)
+    """
+    if isinstance(reference, str):
+        return reference.split(":")[0]
+    return None
+
+
+def _references(layer):
+    """
+    returns all data references of a layer (y can be a list of references)
+    """
+    references = []
+    for key in DATA_KEYS:
+        value = layer.get(key)
+        if isinstance(value, list) and value and all(isinstance(v, str) for v in value):
+            references += value
+        elif value is not None:
+            references.append(value)
+    return references
+
+
+def _values(reference, data):
+    """
+    returns the array of a data reference:
+    "name" (the whole array), "name:column" (a column of a table) or a list of numbers
+    """
+    if not isinstance(reference, str):
+        return np.asarray(reference, dtype=float)
+    name, _, column = reference.partition(":")
+    if name not in data:
+        raise ValueError("ERROR: unknown data %r" % name)
+    entry = data[name]
+    array = load_data(entry["file"], **{k: v for k, v in entry.items() if k != "file"})
+    return array[:, int(column)] if column else array
+
+
+def _resolve(base, path):
+    return os.path.normpath(os.path.join(base, os.path.expanduser(path)))
+
+
+def load_specs(path):
+    """
+    Reads a json file with figure specs and returns a list of figure specs.
+    The file contains a single figure spec or
+
+        {"defaults": {...}, "data": {...}, "figures": [{...}, ...]}
+
+    where the defaults are used for every figure and data is shared by all figures.
+    A figure spec contains the keyword arguments of make_figure
+    (e.g. width, height, unit, serif, font_size, num_subplots_x, output_file) and
+
+    - data: {name: file} or {name: {"file": file, options of np.loadtxt}} (see load_data)
+    - layers: list of plots in the order they are drawn, each a dict with
+      "type": "series" (lines) or "contour" (see contourplots.contourplot),
+      the data references "x", "y" (series: also a list of references) and "z" (contour),
+      "ax": index of the axes (in the flat list of subplots, default 0),
+      all other keys are passed to ax.plot or contourplot
+      (series: "label" or "labels" (one per y), "batch": true draws all y with plot_series)
+    - axes: settings of the axes for ax.set (e.g. xlabel, ylim) and "legend": true,
+      a dict for the first axes or a list with one dict per axes
+
+    A data reference is "name", "name:column" (column of a table) or a list of numbers.
+    Relative paths (data and output_file) are relative to the json file.
+    Only the data which is used by the layers is kept in the returned specs.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8") as f:
+        content = json.load(f)
+    if "figures" not in content:
+        content = {"figures": [content]}
+    shared_data = content.get("data", {})
+    specs = []
+    for i, figure_spec in enumerate(content["figures"]):
+        spec = dict(content.get("defaults", {}), **figure_spec)
+        if not spec.get("output_file"):
+            raise ValueError("ERROR: figure %d of %s has no output_file" % (i, path))
+        output_file = spec["output_file"]
+        outputs = [output_file] if isinstance(output_file, str) else output_file
+        # bare formats (e.g. "png") are placed next to the first path (see figure.output_paths)
+        spec["output_file"] = [_resolve(base, f) if "." in f else f for f in outputs]
+        data = dict(shared_data, **spec.get("data", {}))
+        used = {_reference_name(r) for layer in spec.get("layers", []) for r in _references(layer)}
+        spec["data"] = {}
+        for name in sorted(used - {None}):
+            if name not in data:
+                raise ValueError("ERROR: figure %d of %s uses unknown data %r" % (i, path, name))
+            entry = data[name] if isinstance(data[name], dict) else {"file": data[name]}
+            spec["data"][name] = dict(entry, file=_resolve(base, entry["file"]))
+        specs.append(spec)
+    return specs
+
+
+def dependencies(spec):
+    """
+    returns the data files which a figure spec uses
+    """
+    return {entry["file"] for entry in spec.get("data", {}).values()}
+
+
+def plot_layers(fig, ax, spec):
+    """
+    plots function of make_figure which draws the layers of a figure spec (see load_specs)
+    """
+    axes = np.ravel(ax)
+    data = spec.get("data", {})
+    for layer in spec.get("layers", []):
+        options = {k: v for k, v in layer.items() if k not in DATA_KEYS + ["type", "ax", "label", "labels", "batch"]}
+        a = axes[layer.get("ax", 0)]
+        kind = layer.get("type", "series")
+        if kind == "series":
+            y = layer["y"]
+            ys = y if isinstance(y, list) and y and all(isinstance(v, str) for v in y) else [y]
+            ys = [_values(v, data) for v in ys]
+            x = _values(layer["x"], data) if "x" in layer else np.arange(len(ys[0]))
+            if layer.get("batch"):
+                figure.plot_series(a, x, np.stack(ys), **options)
+            else:
+                labels = layer.get("labels", [layer.get("label")] * len(ys))
+                for values, label in zip(ys, labels):
+                    a.plot(x, values, label=label, **options)
+        elif kind == "contour":
+            contourplots.contourplot(fig, a, _values(layer["x"], data), _values(layer["y"], data),
+                                     _values(layer["z"], data), **options)
+        else:
+            raise ValueError("ERROR: unknown layer type %r" % kind)
+    settings = spec.get("axes", [])
+    for a, s in zip(axes, [settings] if isinstance(settings, dict) else settings):
+        s = dict(s or {})
+        if s.pop("legend", False):
+            a.legend()
+        a.set(**s)
+
+
+def render(spec, debug=False):
+    """
+    creates and saves the figure of a figure spec (see load_specs), returns the saved paths
+    """
+    kwargs = {k: v for k, v in spec.items() if k not in SPEC_KEYS}
+    kwargs.setdefault("debug", debug)
+    for path in figure.output_paths(spec["output_file"]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    fig, ax = figure.make_figure(plots=functools.partial(plot_layers, spec=spec),
+                                 pyplot=False, reuse=True, **kwargs)
+    figure.release_figure(fig, reuse=True)
+    return figure.output_paths(spec["output_file"])
+
+
+def _spec_key(spec):
+    # figures are identified by their output files
+    return json.dumps(spec["output_file"])
+
+
+def _spec_state(spec):
+    # all fields of a figure spec (the resolved defaults and the used data entries)
+    return json.dumps(spec, sort_keys=True)
+
+
+class SpecRenderer:
+    """
+    Renders the figures of json spec files in one process (see load_specs)
+    and keeps track of their dependencies, so update renders only the figures
+    whose spec fields or data files have changed.
+
+    - spec_files: paths of the json files
+    - debug: debug mode of make_figure (if not given in the spec)
+    """
+
+    def __init__(self, spec_files, debug=False):
+        self.spec_files = [os.path.abspath(f) for f in spec_files]
+        self.debug = debug
+        self._specs = {}  # figure specs by spec file and key
+        self._states = {}  # fields of the last rendered (or failed) figure by key
+        self._stamps = {}  # modification times of spec and data files
+        self.failed = set()  # keys of the figures which could not be rendered
+
+    def _changed(self, path):
+        stamp = _file_stamp(path)
+        changed = self._stamps.get(path, False) != stamp
+        self._stamps[path] = stamp
+        return changed
+
+    def update(self):
+        """
+        reads changed spec files again and renders all new figures and
+        all figures whose spec or data has changed since the last update,
+        returns the number of rendered figures
+        """
+        changed_data = {path for spec in self._all_specs() for path in dependencies(spec)
+                        if self._changed(path)}
+        for spec_file in self.spec_files:
+            if self._changed(spec_file):
+                try:
+                    specs = load_specs(spec_file)
+                except Exception as e:
+                    print("%s: %s" % (spec_file, e))
+                    continue
+                self._specs[spec_file] = {_spec_key(s): s for s in specs}
+                for path in {p for s in specs for p in dependencies(s)}:
+                    if path not in self._stamps:
+                        changed_data.add(path)
+                        self._changed(path)
+        rendered = 0
+        for spec in self._all_specs():
+            key, state = _spec_key(spec), _spec_state(spec)
+            if self._states.get(key) == state and not dependencies(spec) & changed_data:
+                continue
+            self._states[key] = state
+            start = time.perf_counter()
+            try:
+                paths = render(spec, self.debug)
+                print("%s (%.2f s)" % (", ".join(paths), time.perf_counter() - start))
+                self.failed.discard(key)
+            except Exception:
+                self.failed.add(key)
+                print("ERROR: %s\n%s" % (", ".join(spec["output_file"]), traceback.format_exc()))
+            rendered += 1
+        return rendered
+
+    def _all_specs(self):
+        return [spec for specs in self._specs.values() for spec in specs.values()]
+
+    def watch(self, interval=0.5):
+        """
+        renders all figures and then checks the spec and data files every interval seconds
+        and renders the affected figures again (until KeyboardInterrupt)
+        """
+        self.update()
+        print("watching %d figures (ctrl+c to stop)" % len(self._all_specs()))
+        try:
+            while True:
+                time.sleep(interval)
+                self.update()
+        except KeyboardInterrupt:
+            pass
+
+
+def main(argv=None):
+    """
+    command line interface: renders the figures of json spec files, e.g.
+
+        python figurespec.py figures.json --watch
+    """
+    parser = argparse.ArgumentParser(description="renders figures from json figure specs")
+    parser.add_argument("spec_files", nargs="+", help="json files with figure specs")
+    parser.add_argument("--debug", action="store_true", help="renders without LaTeX")
+    parser.add_argument("--watch", action="store_true",
+                        help="renders figures again when their specs or data files change")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between checks in watch mode")
+    args = parser.parse_args(argv)
+    renderer = SpecRenderer(args.spec_files, args.debug)
+    if args.watch:
+        renderer.watch(args.interval)
+        return 0
+    renderer.update()
+    # exit code 1 if a figure could not be rendered
+    return 1 if renderer.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+from matplotlib.collections import PathCollection, QuadMesh
+from matplotlib.image import AxesImage
+from matplotlib.lines import Line2D
+
+from figure import (make_figure, release_figure, save_figure, output_paths,
+                    rasterize_heavy_artists, VECTOR_FORMATS)
+from contourplots import update_contourplot
+
+
+class FigureTemplate:
+    """
+    A figure which is created once with make_figure and then saved for many datasets
+    by replacing the data of its lines, scatter plots and images.
+    setup, the axes, ticks, labels and formatters are not created again.
+
+    - plots: function plots(fig, ax, data) which plots the first dataset
+      (called by make_figure, so tight_layout, scoped and rasterize work like with make_figure)
+    - data: first dataset
+    - all other keyword arguments are passed to make_figure (except cache, output_file
+      saves the first dataset), rasterize is applied again by every render
+
+    The data artists (lines, scatter plots, images of contourplot and pcolormesh) of all axes
+    are stored in creation order in the attribute artists, render expects one
+    entry per artist (see render).
+    """
+
+    def __init__(self, plots, data, **kwargs):
+        if kwargs.get("cache") is not None:
+            raise ValueError("ERROR: FigureTemplate does not support cache")
+        kwargs.setdefault("pyplot", False)
+        self.rasterize = kwargs.get("rasterize")
+        self.fig, self.ax = make_figure(plots=lambda fig, ax: plots(fig, ax, data), **kwargs)
+        artists = [a for axes in self.fig.axes for a in axes.get_children()
+                   if isinstance(a, (Line2D, PathCollection, AxesImage, QuadMesh))]
+        # the colors of colorbars are drawn with a QuadMesh, too
+        colorbar_axes = [a.colorbar.ax for a in artists if getattr(a, "colorbar", None)]
+        self.artists = [a for a in artists if a.axes not in colorbar_axes]
+
+    def update(self, series):
+        """
+        Replaces the data of all artists, series contains one entry per artist:
+
+        - line: (x, y)
+        - scatter plot: (x, y)
+        - image or mesh of contourplot: z (see contourplots.update_contourplot)
+        - image of imshow: array of the image
+        - pcolormesh: values of the cells
+
+        None keeps the data of an artist. Only the limits of axes with
+        changed lines or scatter plots are computed again.
+        """
+        if len(series) != len(self.artists):
+            raise ValueError("ERROR: series must contain one entry for each of the %d artists" % len(self.artists))
+        changed_axes = []
+        for artist, data in zip(self.artists, series):
+            if data is None:
+                continue
+            if isinstance(artist, Line2D):
+                artist.set_data(*data)
+            elif isinstance(artist, PathCollection):
+                artist.set_offsets(np.column_stack(data))
+            elif hasattr(artist, "contourplot_settings"):
+                update_contourplot(artist, data)
+                continue
+            elif isinstance(artist, AxesImage):
+                artist.set_data(data)
+                continue
+            else:
+                artist.set_array(np.ravel(data))
+                continue
+            if artist.axes not in changed_axes:
+                changed_axes.append(artist.axes)
+        for axes in changed_axes:
+            axes.relim()
+            # relim does not include collections
+            for artist in self.artists:
+                if artist.axes is axes and isinstance(artist, PathCollection):
+                    axes.update_datalim(artist.get_offsets())
+            axes.autoscale_view()
+
+    def render(self, series, output_file, dpi=None):
+        """
+        Replaces the data (see update) and saves the figure to output_file
+        (a path or a list of paths and formats, see figure.save_figure)
+        """
+        self.update(series)
+        paths = output_paths(output_file)
+        if self.rasterize is not None:
+            # the number of elements of the artists depends on the dataset
+            for artist in self.fig.rasterized_artists:
+                artist.set_rasterized(False)
+            self.fig.rasterized_artists = []
+            if any(os.path.splitext(p)[1][1:] in VECTOR_FORMATS for p in paths):
+                self.fig.rasterized_artists = rasterize_heavy_artists(self.fig, self.rasterize)
+        save_figure(self.fig, paths, dpi)
+
+    def close(self):
+        """
+        frees the figure (see release_figure)
+        """
+        release_figure(self.fig)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import math
+
+import numpy as np
+import matplotlib as mpl
+from matplotlib import ticker
+
+# arrays up to this size are formatted with plain python, larger ones with numpy
+SMALL_ARRAY_SIZE = 64
+
+
+def _format(fmt, values):
+    """
+    returns all values formatted with one %-operation as one string (one line per value),
+    fmt is the format of all values or a list with the format of every value
+    """
+    if isinstance(fmt, str):
+        return ((fmt + "\n") * len(values)) % tuple(values)
+    return "\n".join(fmt) % tuple(values) + "\n"
+
+
+def _split_labels(text, decimal_comma, math_text):
+    """
+    replaces decimal separator and minus sign in the text of _format and splits it into labels
+    """
+    if decimal_comma:
+        text = text.replace(".", "{,}" if math_text else ",")
+    if mpl.rcParams["axes.unicode_minus"]:
+        text = text.replace("-", "\N{MINUS SIGN}")
+    return text.split("\n")[:-1]
+
+
+def format_numbers(fmt, values, decimal_comma=False, math_text=True):
+    """
+    Formats all values with the %-format fmt at once (without the locale of the system)
+    and returns a list of strings: the labels are written with a single %-operation into
+    one string, the decimal separator and minus sign are replaced once in that string.
+
+    - fmt: format of one value, e.g. "%1.2f" or r"$\\mathdefault{%1.2f}$"
+    - values: array of numbers
+    - decimal_comma: german number format (0,5 instead of 0.5)
+    - math_text: the labels are math text, so the comma is written as {,}
+      (otherwise LaTeX and mathtext add a space after it)
+
+    The minus sign is replaced by the unicode minus if axes.unicode_minus is set
+    (like the formatters of matplotlib).
+    """
+    values = np.asarray(values, dtype=float).ravel().tolist()
+    return _split_labels(_format(fmt, values), decimal_comma, math_text)
+
+
+def format_values(values, decimals=2, decimal_comma=False):
+    """
+    Formats each value with a fixed number of decimals, values with an absolute value
+    below 1e-3 or from 1e3 on in scientific notation (e.g. 1.50 x 10^4 with mathtext),
+    zero as 0. Returns a list of strings (see format_numbers).
+    """
+    if not isinstance(values, list):
+        values = np.asarray(values, dtype=float).ravel()
+    fixed = r"$\mathdefault{%%1.%df}$" % decimals
+    # the exponent of %e (e.g. 1.50e+04) is replaced by \times10^{4}, which is closed by the extra }
+    scientific = r"$\mathdefault{%%1.%de}}$" % decimals
+    if len(values) > SMALL_ARRAY_SIZE:
+        values = np.asarray(values, dtype=float)
+        magnitude = np.abs(values)
+        is_scientific = (magnitude != 0) & ((magnitude < 1e-3) | (magnitude >= 1e3)) & np.isfinite(values)
+        fmt = np.where(is_scientific, scientific, fixed).tolist() if is_scientific.any() else fixed
+        zeros = np.flatnonzero(magnitude == 0).tolist()
+        values = values.tolist()
+    else:
+        fmt = [scientific if (v != 0 and (-1e-3 < v < 1e-3 or 1e3 <= abs(v) < math.inf)) else fixed
+               for v in values]
+        zeros = [i for i, v in enumerate(values) if v == 0]
+    text = _format(fmt, values)
+    if fmt is not fixed and scientific in fmt:
+        for exponent, power in [("e+0", "{"), ("e+", "{"), ("e-0", "{-"), ("e-", "{-")]:
+            text = text.replace(exponent, r"\times10^" + power)
+    labels = _split_labels(text, decimal_comma, True)
+    for i in zeros:
+        labels[i] = "0"
+    return labels
+
+
+class NumberFormatter(ticker.ScalarFormatter):
+    """
+    ScalarFormatter which formats all ticks of an axis with one call of format_numbers
+    (instead of one call per tick) and writes the decimal separator without the locale
+    of the system. Offsets and scientific notation work as for ScalarFormatter
+    (e.g. ax.ticklabel_format(style="sci", scilimits=(-3, 3))).
+
+    - decimal_comma: german number format (0,5 instead of 0.5)
+    - decimals: fixed number of decimals (default None: as few as needed, like ScalarFormatter)
+    - useOffset, useMathText: see ScalarFormatter
+    """
+
+    def __init__(self, decimal_comma=False, decimals=None, useOffset=None, useMathText=True):
+        super().__init__(useOffset=useOffset, useMathText=useMathText, useLocale=False)
+        self.decimal_comma = decimal_comma
+        self.decimals = decimals
+
+    def _set_format(self):
+        if self.decimals is None:
+            super()._set_format()
+            return
+        self._format = "%%1.%df" % self.decimals
+        if self._usetex or self._useMathText:
+            self._format = r"$\mathdefault{%s}$" % self._format
+
+    def _format_maybe_minus_and_locale(self, fmt, arg):
+        # used for single values, e.g. the offset and the value under the cursor
+        return format_numbers(fmt, [arg], self.decimal_comma, self._useMathText or self._usetex)[0]
+
+    def format_ticks(self, values):
+        self.set_locs(values)
+        if len(values) == 0:
+            return []
+        scaled = (np.asarray(values, dtype=float) - self.offset) / 10. ** self._orderOfMagnitude
+        scaled[np.abs(scaled) < 1e-8] = 0
+        return format_numbers(self._format, scaled, self.decimal_comma, self._useMathText or self._usetex)
+
+
+class IndexFormatter(ticker.Formatter):
+    """
+    Formatter for axes whose tick positions are indices of values,
+    e.g. the pixels of contourplot: the tick at position i shows values[i]
+    (see format_values)
+
+    - values: array of the values at the indices
+    - decimals: number of decimals
+    - decimal_comma: german number format (0,5 instead of 0.5)
+
+    Positions outside of the indices (e.g. ticks beyond the last value) get no label.
+    """
+
+    def __init__(self, values, decimals=2, decimal_comma=False):
+        self.values = np.asarray(values)
+        self._value_list = None  # values as list for few ticks
+        self.decimals = decimals
+        self.decimal_comma = decimal_comma
+
+    def format_ticks(self, positions):
+        n = len(self.values)
+        if len(positions) > SMALL_ARRAY_SIZE:
+            positions = np.asarray(positions)
+            inside = (positions >= 0) & (positions < n)
+            if inside.all():
+                return format_values(self.values[positions.astype(int)], self.decimals, self.decimal_comma)
+            positions = np.where(inside, positions, -1).astype(int).tolist()
+        else:
+            positions = [int(p) if 0 <= p < n else -1 for p in np.asarray(positions).tolist()]
+        if self._value_list is None:
+            self._value_list = self.values.tolist()
+        labels = iter(format_values([self._value_list[p] for p in positions if p >= 0],
+                                    self.decimals, self.decimal_comma))
+        return [next(labels) if p >= 0 else "" for p in positions]
+
+    def __call__(self, x, pos=None):
+        return self.format_ticks([x])[0]
+
+
+class SharedLocator(ticker.Locator):
+    """
+    Locator for many axes with the same limits (e.g. small multiples, see figure.share_axes):
+    the tick positions of locator are computed once and reused while the limits stay the same
+    (matplotlib asks the locator of every axes again when it is drawn).
+
+    - locator: the locator which computes the tick positions
+    """
+
+    def __init__(self, locator):
+        self.locator = locator
+        self._limits = None
+        self._ticks = None
+
+    def set_axis(self, axis):
+        super().set_axis(axis)
+        self.locator.set_axis(axis)
+
+    def __call__(self, *args):
+        # minor locators also depend on the major ticks (AutoMinorLocator)
+        limits = tuple(self.axis.get_view_interval()) + tuple(self.axis.get_majorticklocs()
+                                                              if self.axis.minor.locator is self else ())
+        if limits != self._limits:
+            self._ticks = self.locator()
+            self._limits = limits
+        return self._ticks
+
+    def tick_values(self, vmin, vmax):
+        return self.locator.tick_values(vmin, vmax)
+
+    def nonsingular(self, v0, v1):
+        return self.locator.nonsingular(v0, v1)
+
+    def view_limits(self, vmin, vmax):
+        return self.locator.view_limits(vmin, vmax)
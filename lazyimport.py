@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import importlib
+import sys
+
+
+class _LazyModule:
+    """
+    Placeholder for a module which is imported on the first access to one of its attributes.
+    After the import the placeholder is replaced by the module in the globals of the module
+    which called lazy_import, so later accesses cost the same as with a normal import.
+    """
+
+    def __init__(self, name, owner_globals):
+        self.__dict__["_name"] = name
+        self.__dict__["_owner_globals"] = owner_globals
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = self.__dict__["_module"] = importlib.import_module(self._name)
+            owner_globals = self.__dict__["_owner_globals"]
+            if owner_globals is not None:
+                for key, value in list(owner_globals.items()):
+                    if value is self:
+                        owner_globals[key] = module
+        return module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._load(), attribute, value)
+
+    def __repr__(self):
+        return "<lazy module %r>" % self._name
+
+
+def lazy_import(name):
+    """
+    Returns the module name if it is already imported, otherwise a placeholder
+    which imports it on first use (e.g. np = lazy_import("numpy"))
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return _LazyModule(name, sys._getframe(1).f_globals)
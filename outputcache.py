@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import functools
+import hashlib
+import os
+import pickle
+import shutil
+import types
+from lazyimport import lazy_import
+
+np = lazy_import("numpy")  # imported on first use (see lazyimport.py)
+
+# values which are hashed by their representation
+_SIMPLE_TYPES = (type(None), bool, int, float, complex, str, bytes)
+
+
+class Uncacheable(Exception):
+    """
+    raised if a value can not be hashed by its content (see figure_key)
+    """
+
+
+def _update_hash(h, value, seen):
+    """
+    adds a value to the hash h
+    arrays are hashed by content, functions by their code, the values they
+    reference (globals, closures, defaults) and the functions they call,
+    partial functions by their function and arguments and all other objects by their pickled bytes
+    (Uncacheable is raised if an object can not be pickled)
+    """
+    if isinstance(value, _SIMPLE_TYPES) or isinstance(value, np.generic):
+        h.update(type(value).__name__.encode() + repr(value).encode())
+    elif isinstance(value, np.ndarray):
+        h.update(b"ndarray" + str((value.dtype.str, value.shape)).encode())
+        h.update(np.ascontiguousarray(value).view(np.uint8).data if value.size else b"")
+    elif isinstance(value, functools.partial):
+        h.update(b"partial")
+        _update_hash(h, value.func, seen)
+        _update_hash(h, value.args, seen)
+        _update_hash(h, value.keywords, seen)
+    elif isinstance(value, (types.FunctionType, types.MethodType)):
+        if isinstance(value, types.MethodType):
+            _update_hash(h, value.__self__, seen)
+            value = value.__func__
+        h.update(b"function" + value.__module__.encode() + value.__qualname__.encode())
+        if id(value) in seen:
+            return
+        seen.add(id(value))
+        _update_hash(h, value.__code__, seen)
+        _update_hash(h, value.__defaults__, seen)
+        _update_hash(h, value.__kwdefaults__, seen)
+        for cell in value.__closure__ or ():
+            try:
+                _update_hash(h, cell.cell_contents, seen)
+            except ValueError:
+                pass  # empty cell
+        for name in _global_names(value.__code__):
+            if name in value.__globals__:
+                _update_hash(h, name, seen)
+                _update_hash(h, value.__globals__[name], seen)
+    elif isinstance(value, types.CodeType):
+        h.update(value.co_code)
+        _update_hash(h, value.co_consts, seen)
+        _update_hash(h, value.co_names, seen)
+    elif isinstance(value, (list, tuple)):
+        h.update(type(value).__name__.encode() + str(len(value)).encode())
+        for v in value:
+            _update_hash(h, v, seen)
+    elif isinstance(value, dict):
+        h.update(b"dict" + str(len(value)).encode())
+        for k in sorted(value, key=repr):
+            _update_hash(h, k, seen)
+            _update_hash(h, value[k], seen)
+    elif isinstance(value, (set, frozenset)):
+        h.update(type(value).__name__.encode() + str(len(value)).encode())
+        for v in sorted(value, key=repr):
+            _update_hash(h, v, seen)
+    elif isinstance(value, types.ModuleType):
+        h.update(b"module" + value.__name__.encode())
+    else:
+        # the representation of objects can be shortened (e.g. of large arrays in an object),
+        # so they are hashed by their content
+        try:
+            data = pickle.dumps(value, protocol=4)
+        except Exception as e:
+            raise Uncacheable("%s can not be hashed: %s" % (type(value).__name__, e))
+        h.update(b"pickle" + type(value).__qualname__.encode() + data)
+
+
+def _global_names(code):
+    """
+    returns the global names used by a code object and its nested code objects
+    (e.g. list comprehensions and inner functions)
+    """
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.update(_global_names(const))
+    return sorted(names)
+
+
+def figure_key(**kwargs):
+    """
+    Returns the hash of the arguments of make_figure.
+    The plots function is hashed with its code and the data it uses
+    (arrays in globals, closures and default arguments, arguments of partial functions).
+    Returns None if an argument can not be hashed by its content (e.g. an object
+    which can not be pickled), such figures are not cached.
+    """
+    h = hashlib.sha256()
+    try:
+        _update_hash(h, kwargs, set())
+    except Uncacheable:
+        return None
+    return h.hexdigest()
+
+
+class OutputCache:
+    """
+    Content-addressed cache for saved figures (see make_figure(cache=...)).
+    Files are stored in directory under the hash of all arguments of make_figure,
+    if the cache grows above max_bytes the least recently used files are removed.
+
+    - directory: folder of the cached files
+    - max_bytes: maximum size of all files in the cache (default 1 GB)
+    - link: hard links the output file to the cached file instead of copying it
+      (only works if both are on the same file system)
+
+    The number of hits and misses is counted in the attributes hits and misses.
+    """
+
+    def __init__(self, directory, max_bytes=2**30, link=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, output_file):
+        return os.path.join(self.directory, key + os.path.splitext(output_file)[1])
+
+    def fetch(self, key, output_file):
+        """
+        writes the cached file of key to output_file, returns False if it is not cached
+        (output_file can be a list of paths, then all of them must be cached)
+        """
+        output_files = [output_file] if isinstance(output_file, (str, os.PathLike)) else output_file
+        paths = [self._path(key, f) for f in output_files]
+        if not all(os.path.exists(path) for path in paths):
+            self.misses += 1
+            return False
+        for path, output_file in zip(paths, output_files):
+            os.utime(path)  # mark as recently used
+            if os.path.lexists(output_file):
+                os.remove(output_file)
+            if self.link:
+                try:
+                    os.link(path, output_file)
+                except OSError:
+                    shutil.copyfile(path, output_file)
+            else:
+                shutil.copyfile(path, output_file)
+        self.hits += 1
+        return True
+
+    def fetch_bytes(self, key, formats):
+        """
+        returns the cached files of key as dict {format: bytes} (see asyncfigure.make_figure_async),
+        None if one of the formats is not cached
+        """
+        formats = [formats] if isinstance(formats, str) else formats
+        files = {}
+        try:
+            for f in formats:
+                path = self._path(key, "." + f)
+                with open(path, "rb") as file:
+                    files[f] = file.read()
+                os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            # not cached or removed by another process
+            self.misses += 1
+            return None
+        self.hits += 1
+        return files
+
+    def store_bytes(self, key, files):
+        """
+        stores files in memory (dict {format: bytes}) in the cache under key
+        """
+        for f, data in files.items():
+            path = self._path(key, "." + f)
+            with open(path + ".tmp", "wb") as file:
+                file.write(data)
+            os.replace(path + ".tmp", path)
+        self.evict()
+
+    def _files(self):
+        """
+        returns (modification time, size, path) of all files in the cache,
+        files which are removed in the meantime (e.g. by another process) are skipped
+        """
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                files.append((os.path.getmtime(path), os.path.getsize(path), path))
+            except FileNotFoundError:
+                pass
+        return files
+
+    def store(self, key, output_file):
+        """
+        stores output_file (or a list of paths) in the cache under key
+        """
+        output_files = [output_file] if isinstance(output_file, (str, os.PathLike)) else output_file
+        for output_file in output_files:
+            path = self._path(key, output_file)
+            shutil.copyfile(output_file, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        self.evict()
+
+    def evict(self):
+        """
+        removes the least recently used files until the cache is smaller than max_bytes
+        """
+        files = [f for f in self._files() if not f[2].endswith(".tmp")]
+        size = sum(s for _, s, _ in files)
+        for _, file_size, file in sorted(files):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass  # removed by another process
+            size -= file_size
+
+    def stats(self):
+        """
+        returns a dict with the number of hits, misses, files and bytes in the cache
+        """
+        files = self._files()
+        return {"hits": self.hits, "misses": self.misses, "files": len(files),
+                "bytes": sum(s for _, s, _ in files)}
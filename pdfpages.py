@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+from lazyimport import lazy_import
+
+import figure
+
+# heavy modules are imported on first use (see lazyimport.py)
+mpl = lazy_import("matplotlib")
+backend_pdf = lazy_import("matplotlib.backends.backend_pdf")
+backend_pgf = lazy_import("matplotlib.backends.backend_pgf")
+shutil = lazy_import("shutil")
+subprocess = lazy_import("subprocess")
+tempfile = lazy_import("tempfile")
+
+
+class _PgfPages:
+    """
+    Multi-page pdf of the pgf backend which writes every page to its own pgf file
+    in a temporary directory (instead of keeping the whole document in memory
+    like backend_pgf.PdfPages) and compiles all pages with one LaTeX run at close.
+    """
+
+    def __init__(self, filename, metadata=None):
+        self._output_name = filename
+        self._n_figures = 0
+        self._info_dict = backend_pgf._create_pdf_info_dict("pgf", dict(metadata or {}))
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._file = open(os.path.join(self._tmpdir.name, "pdf_pages.tex"), "wb")
+
+    def _write_header(self, width, height):
+        # the same LaTeX header as backend_pgf.PdfPages
+        backend_pgf.PdfPages._write_header(self, width, height)
+
+    def savefig(self, fig, **kwargs):
+        width, height = fig.get_size_inches()
+        if self._n_figures == 0:
+            self._write_header(width, height)
+        else:
+            self._file.write(
+                rb'\newpage'
+                rb'\ifdefined\pdfpagewidth\pdfpagewidth\else\pagewidth\fi=%fin'
+                rb'\ifdefined\pdfpageheight\pdfpageheight\else\pageheight\fi=%fin'
+                b'%%\n' % (width, height))
+        # own file per page, so raster images of different pages get different names
+        page = "page%d.pgf" % self._n_figures
+        fig.savefig(os.path.join(self._tmpdir.name, page), format="pgf", backend="pgf", **kwargs)
+        self._file.write(b"\\input{%s}%%\n" % page.encode())
+        self._file.flush()
+        self._n_figures += 1
+
+    def get_pagecount(self):
+        return self._n_figures
+
+    def close(self, discard=False):
+        self._file.write(b"\\end{document}\n")
+        self._file.close()
+        try:
+            if not discard and self._n_figures > 0:
+                subprocess.run([mpl.rcParams["pgf.texsystem"], "-interaction=nonstopmode",
+                                "-halt-on-error", "-no-shell-escape", "pdf_pages.tex"],
+                               cwd=self._tmpdir.name, check=True, stdin=subprocess.DEVNULL,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                shutil.move(os.path.join(self._tmpdir.name, "pdf_pages.pdf"), self._output_name)
+        finally:
+            self._tmpdir.cleanup()
+
+
+class PdfPages:
+    """
+    Context manager which saves many figures as pages of one pdf file, e.g.
+
+        with PdfPages("sweep.pdf") as pdf:
+            for p in parameters:
+                pdf.add_page(functools.partial(plots, p=p), width=8, unit="cm")
+
+    With the pgf backend the pages are written to disk one by one and compiled
+    with a single LaTeX run when the file is closed, so all pages share one
+    LaTeX session and one set of embedded fonts.
+    Every figure is freed after its page is written (see figure.release_figure),
+    so the memory does not grow with the number of pages.
+
+    - filename: path of the pdf file
+    - debug: uses the pdf backend of matplotlib instead of LaTeX (see figure.setup)
+    - metadata: information dict of the pdf (e.g. {"Title": ..., "Author": ...})
+    - release: frees the figures after saving them (default True)
+
+    If the with block raises an exception, the pdf file is not written
+    (in debug mode the file is written page by page, so it is removed).
+    """
+
+    def __init__(self, filename, debug=False, metadata=None, release=True):
+        self.filename = filename
+        self.debug = debug
+        self.release = release
+        if debug:
+            self._pages = backend_pdf.PdfPages(filename, metadata=metadata)
+        elif figure._pgf_has(("PdfPages._write_header", "_create_pdf_info_dict")):
+            self._pages = _PgfPages(filename, metadata=metadata)
+        else:
+            # matplotlib without the private methods used by _PgfPages: all pages are kept in memory
+            self._pages = backend_pgf.PdfPages(filename, metadata=metadata)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
+
+    def savefig(self, fig, **kwargs):
+        """
+        saves a figure as the next page and frees it (if release is True),
+        all other keyword arguments are passed to fig.savefig
+        """
+        with figure._figure_style(fig):
+            figure.prefetch_text_metrics(fig)
+            self._pages.savefig(fig, **kwargs)
+        if self.release:
+            figure.release_figure(fig, reuse=True)
+
+    def add_page(self, plots, **kwargs):
+        """
+        creates a figure with make_figure (without pyplot, from the figure pool),
+        plots it with plots(fig, ax) and saves it as the next page
+
+        - plots: function that takes fig and ax and performs the plots
+        - all other keyword arguments are passed to make_figure (except output_file)
+        """
+        fig, ax = figure.make_figure(plots=plots, debug=self.debug, pyplot=False, reuse=True, **kwargs)
+        self.savefig(fig)
+
+    def get_pagecount(self):
+        """
+        returns the number of pages written up to now
+        """
+        return self._pages.get_pagecount()
+
+    def close(self, discard=False):
+        """
+        finishes the pdf file (with the pgf backend LaTeX runs here),
+        discard=True does not write the pdf file (in debug mode the file is removed)
+        """
+        if not isinstance(self._pages, _PgfPages):
+            # the pdf backend opens the file when the first page is saved
+            opened = getattr(self._pages, "_file", None) is not None
+            self._pages.close()
+            if discard and opened and os.path.exists(self.filename):
+                os.remove(self.filename)
+        else:
+            self._pages.close(discard)
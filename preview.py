@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import sys
+import atexit
+import threading
+from lazyimport import lazy_import
+
+import figure
+
+# heavy modules are imported on first use (see lazyimport.py)
+mpl = lazy_import("matplotlib")
+mtext = lazy_import("matplotlib.text")
+subprocess = lazy_import("subprocess")
+tempfile = lazy_import("tempfile")
+
+# rcParams of the Agg preview of serif figures: Computer Modern (shipped with matplotlib)
+# instead of the default font of matplotlib to match the LaTeX fonts of the pgf backend
+# (cmr10 has no unicode minus sign)
+PREVIEW_RC = {"font.serif": ["cmr10"], "mathtext.fontset": "cm", "axes.unicode_minus": False}
+
+# temporary files of open previews and the process ids of their viewers
+_preview_files = {}
+
+
+def _default_viewer():
+    """
+    returns the command which opens a file with the default program of the system
+    """
+    if sys.platform == "darwin":
+        return "open"
+    return "xdg-open"
+
+
+@atexit.register
+def _remove_preview_files():
+    # a viewer started by xdg-open may not have read the file yet, so the files are
+    # removed by a detached process after the viewer has exited (see figure.remove_when_closed)
+    for path, pid in list(_preview_files.items()):
+        if pid is None:
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            figure.remove_when_closed(pid, [path])
+    _preview_files.clear()
+
+
+def render_preview(fig, dpi=100):
+    """
+    Renders the figure with Agg (without LaTeX) and returns the png as bytes.
+    Serif texts are drawn with the Computer Modern fonts of matplotlib (see PREVIEW_RC),
+    the layout is the one of the figure (e.g. from figure.layout with the LaTeX metrics),
+    so the preview is a close approximation of the saved figure.
+    """
+    buffer = io.BytesIO()
+    if "serif" not in mpl.rcParams["font.family"]:
+        fig.savefig(buffer, format="png", dpi=dpi, backend="agg")
+        return buffer.getvalue()
+    # the math font is stored in the font properties of every text when it is created
+    fonts = [t.get_fontproperties() for t in fig.findobj(mtext.Text)]
+    math_fonts = [f.get_math_fontfamily() for f in fonts]
+    try:
+        for f in fonts:
+            f.set_math_fontfamily(PREVIEW_RC["mathtext.fontset"])
+        with mpl.rc_context(PREVIEW_RC):
+            fig.savefig(buffer, format="png", dpi=dpi, backend="agg")
+    finally:
+        for f, math_font in zip(fonts, math_fonts):
+            f.set_math_fontfamily(math_font)
+    return buffer.getvalue()
+
+
+class Preview:
+    """
+    Preview of a figure in an external viewer (see preview).
+
+    - path: temporary png file shown by the viewer
+    - process: process of the viewer
+    """
+
+    def __init__(self, fig, viewer=None, dpi=100, watch=False, interval=0.5):
+        self.fig = fig
+        self.dpi = dpi
+        handle, self.path = tempfile.mkstemp(prefix="figure_preview_", suffix=".png")
+        os.close(handle)
+        _preview_files[self.path] = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self.update()
+        self.process = subprocess.Popen([viewer or _default_viewer(), self.path],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        _preview_files[self.path] = self.process.pid
+        # waits for the viewer, so it does not remain as zombie process while the script runs
+        threading.Thread(target=self.process.wait, daemon=True).start()
+        self._watcher = None
+        if watch:
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+            self._watcher.start()
+
+    def update(self):
+        """
+        renders the figure again and replaces the file of the preview
+        (viewers which reload changed files show the new version)
+        """
+        with self._lock:
+            png = render_preview(self.fig, self.dpi)
+            with open(self.path + ".tmp", "wb") as f:
+                f.write(png)
+            os.replace(self.path + ".tmp", self.path)
+            # savefig marks the figure as changed when it restores dpi and colors
+            self.fig.stale = False
+
+    def _watch(self, interval):
+        """
+        updates the preview whenever the figure was changed (fig.stale),
+        checked every interval seconds until close
+        """
+        while not self._closed.wait(interval):
+            if self.fig.stale:
+                try:
+                    self.update()
+                except Exception:
+                    pass  # the figure is being changed at the moment, try again later
+
+    def close(self):
+        """
+        stops watching the figure and removes the temporary file
+        (the viewer is not closed)
+        """
+        self._closed.set()
+        if self._watcher is not None:
+            self._watcher.join()
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            _preview_files.pop(self.path, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def preview(fig, viewer=None, dpi=100, watch=False, interval=0.5):
+    """
+    Shows a fast raster preview of a figure without blocking (instead of figure.show).
+    The figure is rendered with Agg instead of LaTeX (see render_preview)
+    into a unique temporary png file, which is removed by close() or after the end
+    of the program when the viewer was closed (see figure.remove_when_closed).
+
+    - fig: figure to show
+    - viewer: program which opens the png (default: xdg-open, open on macOS)
+    - dpi: resolution of the preview
+    - watch: renders the preview again whenever the figure is changed
+    - interval: seconds between the checks for changes (with watch)
+
+    Returns a Preview (see Preview.update and Preview.close).
+    """
+    return Preview(fig, viewer, dpi, watch, interval)
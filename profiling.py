@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import functools
+import threading
+from lazyimport import lazy_import
+
+# heavy modules are imported on first use (see lazyimport.py)
+csv = lazy_import("csv")
+json = lazy_import("json")
+inspect = lazy_import("inspect")
+
+# functions hook(event) which get the event of every finished phase
+_hooks = []
+# counters which are recorded for every phase (name -> function returning the current value)
+_counters = {}
+# phases which are running at the moment, per thread
+_local = threading.local()
+
+
+def add_hook(hook):
+    """
+    Enables profiling: hook(event) is called at the end of every phase of make_figure,
+    save_figure and contourplot (and of all other phases, see phase).
+    event is a dict with the keys
+
+    - phase: name of the phase, nested phases are joined by "/" (e.g. "make_figure/plots")
+    - start: time.perf_counter() at the start of the phase
+    - duration: wall time of the phase in seconds
+    - thread: name of the thread
+    - counters: dict of counters (e.g. latex_roundtrips, artists, bytes_written)
+    - all keyword arguments of phase (e.g. output_file)
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    """
+    removes a hook of add_hook (profiling is disabled when no hook is left)
+    """
+    _hooks.remove(hook)
+
+
+def enabled():
+    return bool(_hooks)
+
+
+def register_counter(name, function):
+    """
+    registers a counter which is recorded for every phase as the difference
+    of function() at the end and at the start of the phase
+    """
+    _counters[name] = function
+
+
+def count(**counters):
+    """
+    adds to the counters of the innermost running phase of this thread
+    (nothing happens if profiling is disabled, see phase)
+    """
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].add(**counters)
+
+
+def emit(event):
+    """
+    passes an event to all hooks (e.g. an event of a worker process, see figure.make_figures)
+    """
+    for hook in list(_hooks):
+        hook(event)
+
+
+class _NullPhase:
+    """
+    phase while profiling is disabled: does nothing
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def __bool__(self):
+        return False
+
+    def add(self, **counters):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+
+    def __init__(self, name, info):
+        self.name = name
+        self.info = info
+        self.counters = {}
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault("stack", [])
+        stack.append(self)
+        self.path = "/".join(p.name for p in stack)
+        self._start_counters = {name: function() for name, function in _counters.items()}
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self.start
+        _local.stack.pop()
+        for name, function in _counters.items():
+            self.counters.setdefault(name, function() - self._start_counters.get(name, 0))
+        event = dict(self.info, phase=self.path, start=self.start, duration=duration,
+                     thread=threading.current_thread().name, counters=self.counters)
+        if exc_type is not None:
+            event["error"] = exc_type.__name__
+        emit(event)
+        return False
+
+    def __bool__(self):
+        return True
+
+    def add(self, **counters):
+        """
+        adds to counters of the phase, e.g. phase.add(bytes_written=1000)
+        """
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+
+def phase(name, **info):
+    """
+    Context manager which measures a phase, e.g.
+
+        with profiling.phase("plots") as p:
+            ...
+            if p:  # only computed if profiling is enabled
+                p.add(lines=len(ax.lines))
+
+    - name: name of the phase
+    - info: additional entries of the event (e.g. output_file)
+
+    Without hooks (see add_hook) an empty context manager is returned,
+    so the phases cost almost nothing when profiling is disabled.
+    """
+    if not _hooks:
+        return _NULL_PHASE
+    return _Phase(name, info)
+
+
+def profiled(name, *info_arguments):
+    """
+    Decorator which measures every call of a function as phase name
+
+    - info_arguments: names of arguments which are added to the event (e.g. "output_file")
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _hooks:
+                return function(*args, **kwargs)
+            arguments = inspect.signature(function).bind_partial(*args, **kwargs).arguments
+            info = {key: arguments[key] for key in info_arguments if arguments.get(key) is not None}
+            with _Phase(name, info):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TimingAggregator:
+    """
+    Hook which collects the events of all phases (e.g. of a batch of figures)
+    and summarizes them by phase, e.g.
+
+        with profiling.TimingAggregator() as timings:
+            make_figures(specs)
+        print(timings.report())
+        timings.to_csv("timings.csv")
+
+    - events: list of all events (see add_hook)
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def __enter__(self):
+        add_hook(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        remove_hook(self)
+
+    def summary(self):
+        """
+        returns a dict by phase with count, total, mean, min and max of the durations
+        in seconds and the sums of the counters
+        """
+        phases = {}
+        for event in self.events:
+            entry = phases.setdefault(event["phase"], {"count": 0, "total": 0.0, "min": float("inf"),
+                                                       "max": 0.0, "counters": {}})
+            entry["count"] += 1
+            entry["total"] += event["duration"]
+            entry["min"] = min(entry["min"], event["duration"])
+            entry["max"] = max(entry["max"], event["duration"])
+            for name, value in event["counters"].items():
+                entry["counters"][name] = entry["counters"].get(name, 0) + value
+        for entry in phases.values():
+            entry["mean"] = entry["total"] / entry["count"]
+        return phases
+
+    def report(self):
+        """
+        returns the summary as text table (phases sorted by name, so nested phases follow their parent)
+        """
+        lines = ["%-50s %6s %10s %10s %10s  %s" % ("phase", "count", "total [s]", "mean [s]", "max [s]", "counters")]
+        for name, entry in sorted(self.summary().items()):
+            counters = ", ".join("%s=%g" % item for item in sorted(entry["counters"].items()) if item[1])
+            lines.append("%-50s %6d %10.3f %10.3f %10.3f  %s" % (name, entry["count"], entry["total"],
+                                                                  entry["mean"], entry["max"], counters))
+        return "\n".join(lines)
+
+    def to_json(self, path):
+        """
+        saves the summary and all events as json
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary(), "events": self.events}, f, indent=1, default=str)
+
+    def to_csv(self, path):
+        """
+        saves all events as csv, one row per event with one column per counter
+        """
+        counters = sorted({name for event in self.events for name in event["counters"]})
+        keys = sorted({key for event in self.events for key in event} - {"phase", "duration", "counters"})
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["phase", "duration"] + keys + counters)
+            for event in self.events:
+                writer.writerow([event["phase"], event["duration"]] + [event.get(k, "") for k in keys]
+                                + [event["counters"].get(c, 0) for c in counters])